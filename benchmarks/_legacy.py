@@ -0,0 +1,490 @@
+# Reference implementations kept verbatim from earlier versions of Monada,
+# used by the benchmarks as the "before" side and as correctness oracles.
+# Only the way they get at the table bytes is adapted to the current tree.
+import io
+import struct
+from io import BytesIO
+from struct import unpack
+
+from compression.huffman import NibbleOrder
+
+from xseq import *
+
+def ReadInstructions(instructionTable, length):
+    result = []
+    data = BytesIO(instructionTable.Data)
+    entryCount = instructionTable.EntryCount
+    
+    for i in range(entryCount):
+        result.append(XseqInstruction((
+            unpack("<h", data.read(2))[0],
+            unpack("<h", data.read(2))[0],
+            unpack("<h", data.read(2))[0],
+            unpack("<h", data.read(2))[0],
+            unpack("<i", data.read(4))[0] if length == PointerLength.Int else \
+            unpack("<l", data.read(8))[0]
+        )))
+    
+    return CreateInstructions(result)
+
+def ReadArguments(argumentTable, instructions, stringTable, length, context):
+    result = []
+    data = BytesIO(argumentTable.Data)
+    entryCount = argumentTable.EntryCount
+    
+    for i in range(entryCount):
+        if length == PointerLength.Int:
+            result.append(XseqArgument((
+                unpack("<i", data.read(4))[0],
+                unpack("<I", data.read(4))[0],
+            )))
+        elif length == PointerLength.Long:
+            _type = unpack("<i", data.read(4))[0],
+            data.read(4)
+            value = unpack("<I", data.read(4))[0],
+            data.read(4)
+            result.append(XseqArgument((
+                _type, value
+            )))
+    
+    return CreateArguments(result, instructions, stringTable, context)
+
+def huffman_decompress(data, bit_depth):
+    def decode_headerless(input_stream, output_stream, decompressed_size):
+        nibble_order = NibbleOrder.LowNibbleFirst 
+        result = bytearray(decompressed_size * 8 // bit_depth)
+
+        with io.BytesIO(input_stream.read()) as br:
+            tree_size = br.read(1)[0]
+            tree_root = br.read(1)[0]
+            tree_buffer = br.read(tree_size * 2)
+
+            i = 0
+            code = 0
+            next_val = 0
+            pos = tree_root
+            result_pos = 0
+
+            while result_pos < len(result):
+                if i % 32 == 0:
+                    code = struct.unpack("I", br.read(4))[0]
+
+                next_val += ((pos & 0x3F) << 1) + 2
+                direction = 2 if (code >> (31 - i) % 32) % 2 == 0 else 1
+                leaf = (pos >> 5 >> direction) % 2 != 0
+
+                pos = tree_buffer[next_val - direction]
+
+                if leaf:
+                    result[result_pos] = pos
+                    result_pos += 1
+                    pos = tree_root
+                    next_val = 0
+                    
+                i += 1
+
+        if bit_depth == 8:
+            output_stream.write(result)
+        else:
+            combined_data = [
+                (result[2 * j] | (result[2 * j + 1] << 4))
+                if nibble_order == NibbleOrder.LowNibbleFirst
+                else ((result[2 * j] << 4) | result[2 * j + 1])
+                for j in range(decompressed_size)
+            ]
+
+            output_stream.write(bytes(combined_data))
+
+    with io.BytesIO(data) as input_stream, io.BytesIO() as output_stream:
+        compression_header = input_stream.read(4)
+
+        huffman_mode = 2 if bit_depth == 4 else 3
+        if (compression_header[0] & 0x7) != huffman_mode:
+            raise ValueError(f"Level5 Huffman{bit_depth}")
+
+        decompressed_size = (
+            (compression_header[0] >> 3)
+            | (compression_header[1] << 5)
+            | (compression_header[2] << 13)
+            | (compression_header[3] << 21)
+        )
+        
+        decode_headerless(input_stream, output_stream, decompressed_size)
+
+        return output_stream.getvalue()
+
+def lz10_compress(data: bytes) -> bytes:
+    def compressionSearch(pos):
+        """
+        Find the longest match in `data` (nonlocal) at or after `pos`.
+        This function has been rewritten in place of NSMBe's,
+        to optimize its performance in Python.
+        (A straight port of NSMBe's algorithm caused some files to take
+        over 40 seconds to compress. With this version, all files I've
+        tested take less than one second, and the compressed files
+        match the old algorithm's output byte for byte.)
+        """
+
+        start = max(0, pos - 0x1000)
+
+        # Strategy: do a binary search of potential match sizes, to
+        # find the longest match that exists in the data.
+
+        lower = 0
+        upper = min(18, len(data) - pos)
+
+        recordMatchPos = recordMatchLen = 0
+        while lower <= upper:
+            # Attempt to find a match at the middle length
+            matchLen = (lower + upper) // 2
+            match = data[pos : pos + matchLen]
+            if False:
+                matchPos = data.rfind(match, start, pos)
+            else:
+                matchPos = data.find(match, start, pos)
+
+            if matchPos == -1:
+                # No such match -- any matches will be smaller than this
+                upper = matchLen - 1
+            else:
+                # Match found!
+                if matchLen > recordMatchLen:
+                    recordMatchPos, recordMatchLen = matchPos, matchLen
+                lower = matchLen + 1
+
+        return recordMatchPos, recordMatchLen
+    
+    result = bytearray()
+
+    current = 0 # Index of current byte to compress
+
+    ignorableDataAmount = 0
+    ignorableCompressedAmount = 0
+
+    bestSavingsSoFar = 0
+    
+    while current < len(data):
+        blockFlags = 0
+
+        # We'll go back and fill in blockFlags at the end of the loop.
+        blockFlagsOffset = len(result)
+        result.append(0)
+        ignorableCompressedAmount += 1
+
+        for i in range(8):
+
+            # Not sure if this is needed. The DS probably ignores this data.
+            if current >= len(data):
+                if True:
+                    result.append(0)
+                continue
+
+            searchPos, searchLen = compressionSearch(current)
+            searchDisp = current - searchPos - 1
+
+            if searchLen > 2:
+                # We found a big match; let's write a compressed block
+                blockFlags |= 1 << (7 - i)
+
+                result.append((((searchLen - 3) & 0xF) << 4) | ((searchDisp >> 8) & 0xF))
+                result.append(searchDisp & 0xFF)
+                current += searchLen
+
+                ignorableDataAmount += searchLen
+                ignorableCompressedAmount += 2
+
+            else:
+                result.append(data[current])
+                current += 1
+                ignorableDataAmount += 1
+                ignorableCompressedAmount += 1
+
+            savingsNow = current - len(result)
+            if savingsNow > bestSavingsSoFar:
+                ignorableDataAmount = 0
+                ignorableCompressedAmount = 0
+                bestSavingsSoFar = savingsNow
+
+        result[blockFlagsOffset] = blockFlags
+      
+    return struct.pack('<I', len(data) << 3 | 0x1) + bytes(result)
+
+def lzss_decompress(data):
+    output = []
+    p = 4
+    op = 0
+
+    mask = 0
+    flag = 0
+
+    while p < len(data):
+        if mask == 0:
+            flag = data[p]
+            p += 1
+            mask = 0x80
+
+        if (flag & mask) == 0:
+            if p + 1 > len(data):
+                break
+            output.append(data[p])
+            p += 1
+            op += 1
+        else:
+            if p + 2 > len(data):
+                break
+            dat = (data[p] << 8) | data[p + 1]
+            p += 2
+            pos = (dat & 0x0FFF) + 1
+            length = (dat >> 12) + 3
+
+            for i in range(length):
+                if op - pos >= 0:
+                    output.append(output[op - pos] if op - pos < len(output) else 0)
+                    op += 1
+
+        mask >>= 1
+        
+    return bytes(output)
+
+def rle_decompress(input_bytes):
+    input_stream = io.BytesIO(input_bytes)
+    compression_header = input_stream.read(4)
+    
+    if compression_header[0] & 0x7 != 0x4:
+        raise Exception("Not Level5 Rle")
+
+    decompressed_size = (compression_header[0] >> 3) | (compression_header[1] << 5) | \
+                        (compression_header[2] << 13) | (compression_header[3] << 21)
+
+    output_stream = bytearray()
+    while len(output_stream) < decompressed_size:
+        flag = input_stream.read(1)[0]
+        if flag & 0x80:
+            repetitions = (flag & 0x7F) + 3
+            output_stream.extend(bytes([input_stream.read(1)[0]]) * repetitions)
+        else:
+            length = flag + 1
+            uncompressed_data = input_stream.read(length)
+            output_stream.extend(uncompressed_data)
+                
+    return bytes(output_stream)
+
+def CreateValueExpression(value, argumentType, rawArgumentType = -1):
+    output = ""
+    if argumentType == ScriptArgumentType.Variable:
+        if value >= 0 and value <= 999:
+            output += f"unk{value}"
+        elif value >= 1000 and value <= 1999:
+            output += f"local{value - 1000}"
+        elif value >= 2000 and value <= 2999:
+            output += f"object{value - 2000}"
+        elif value >= 3000 and value <= 3999:
+            output += f"param{value - 3000}"
+        elif value >= 4000 and value <= 4999:
+            output += f"global{value - 4000}"
+    else:
+        if argumentType == ScriptArgumentType.Int:
+            output += f"{value}"
+        elif argumentType == ScriptArgumentType.StringHash:
+            output += f"{value}"
+        elif argumentType == ScriptArgumentType.Float:
+            output += f"{value}"
+        elif argumentType == ScriptArgumentType.String:
+            output += f'"{value}"'
+    
+    if rawArgumentType >= 0:
+        output += f"<{rawArgumentType}>"
+    
+    return output
+
+def to_txt(filepath, script):
+    out = open(filepath, "wt")
+    
+    t = 0 # indentation level
+    
+    for function in script.Functions:
+        #function = script.Functions[7]
+        # function declaration
+        out.write(f"def {function.Name}(")
+        # function params
+        for i in range(function.ParameterCount):
+            out.write(f"param{i}")
+            out.write(", ") if i != function.ParameterCount -1 else 0
+        out.write("):\n")
+
+        # body function
+        t = 1
+
+        jumpLookup = {}
+        jumps = script.Jumps[function.JumpIndex:function.JumpIndex + function.JumpCount]
+        for jump in jumps:
+            jumpLookup[jump.InstructionIndex] = []
+        for jump in jumps:
+            jumpLookup[jump.InstructionIndex].append(jump)
+        if function.InstructionCount != 0:
+            for i in range(function.InstructionIndex, function.InstructionIndex + function.InstructionCount):
+                instruction = script.Instructions[i]
+
+                if jumpLookup.get(i):
+                    for jump in jumpLookup[i]:
+                        out.write(f'"{jump.Name}":\n')
+
+                if instruction.Type == 10:
+                    out.write("\t" * t + "yield\n")
+                elif instruction.Type == 11:
+                    out.write("\t" * t + "return ")
+                    if instruction.ArgumentCount > 0:
+                        argument = script.Arguments[instruction.ArgumentIndex]
+                        out.write(f"{CreateValueExpression(argument.Value, argument.Type, argument.RawArgumentType)}\n")
+                    else:
+                        out.write("\n")
+                elif instruction.Type == 12:
+                    out.write("\t" * t + "exit()\n")
+                elif instruction.Type in (30, 33):
+                    out.write("\t" * t + "if ")
+                    if instruction.Type == 33:
+                        out.write("not ")
+                    argument = script.Arguments[instruction.ArgumentIndex + 1]
+                    out.write(f"{CreateValueExpression(argument.Value, argument.Type, argument.RawArgumentType)}")
+                    out.write(f" {CreateGotoStatement(instruction, script)}\n")
+                elif instruction.Type == 31:
+                    out.write("\t" * t + f"{CreateGotoStatement(instruction, script)}\n")
+                elif instruction.Type in (240, 241):
+                    returnValue = CreateValueExpression(instruction.ReturnParameter, ScriptArgumentType.Variable)
+                    value = returnValue
+                    if instruction.ArgumentCount > 0:
+                        value = CreateArrayIndexExpression(
+                            returnValue, script.Arguments[instruction.ArgumentIndex:instruction.ArgumentIndex + instruction.ArgumentCount])
+                    out.write("\t" * t + f"{value}")
+                    if instruction.Type == 240:
+                        out.write("++\n")
+                    elif instruction.Type == 241:
+                        out.write("--\n")
+                else:
+                    leftValue = CreateValueExpression(instruction.ReturnParameter, ScriptArgumentType.Variable)
+                    left = leftValue
+                    if instruction.Type in (100, 250, 251, 252, 253, 254, 260, 261, 262, 270, 271):
+                        if instruction.ArgumentCount > 1:
+                            indexes3 = script.Arguments[
+                                instruction.ArgumentIndex + 1:(instruction.ArgumentIndex + 1) + instruction.ArgumentCount - 1]
+                            left = CreateArrayIndexExpression(leftValue, indexes3)
+                    right = ""
+                    equalsOperator = "="
+                    argument = script.Arguments[instruction.ArgumentIndex]
+                    if instruction.Type == 100:
+                        right = CreateValueExpression(argument.Value, argument.Type, argument.RawArgumentType)
+                    elif instruction.Type in (110, 112, 120):
+                        value = CreateValueExpression(argument.Value, argument.Type, argument.RawArgumentType)
+                        if instruction.Type == 110:
+                            right = f"~{value}"
+                        elif instruction.Type == 112:
+                            right = f"-{value}"
+                        elif instruction.Type == 120:
+                            right = f"not {value}"
+                    elif instruction.Type in (121, 122):
+                        argument1 = script.Arguments[instruction.ArgumentIndex + 1]
+                        lleft = CreateValueExpression(argument.Value, argument.Type, argument.RawArgumentType)
+                        rright = CreateValueExpression(argument1.Value, argument1.Type, argument1.RawArgumentType)
+                        if instruction.Type == 121:
+                            right = f"{lleft} and {rright}"
+                        elif instruction.Type == 122:
+                            right = f"{lleft} or {rright}"
+                    elif instruction.Type in (130, 131, 132, 133, 134, 135, 140, 141, 150, 151, 152, 153, 154, 160, 161, 162, 170, 171):
+                        lleft = CreateValueExpression(argument.Value, argument.Type, argument.RawArgumentType)
+                        if instruction.Type == 140:
+                            right = f"{lleft} + {CreateValueExpression(1, ScriptArgumentType.Int)}"
+                        elif instruction.Type == 141:
+                            right = f"{lleft} - {CreateValueExpression(1, ScriptArgumentType.Int)}"
+                        argument1 = script.Arguments[instruction.ArgumentIndex + 1]
+                        rright = CreateValueExpression(argument1.Value, argument1.Type, argument1.RawArgumentType)
+                        if instruction.Type == 130:
+                            right = f"{lleft} == {rright}"
+                        elif instruction.Type == 131:
+                            right = f"{lleft} != {rright}"
+                        elif instruction.Type == 132:
+                            right = f"{lleft} >= {rright}"
+                        elif instruction.Type == 133:
+                            right = f"{lleft} <= {rright}"
+                        elif instruction.Type == 134:
+                            right = f"{lleft} > {rright}"
+                        elif instruction.Type == 135:
+                            right = f"{lleft} < {rright}"
+                        elif instruction.Type == 150:
+                            right = f"{lleft} + {rright}"
+                        elif instruction.Type == 151:
+                            right = f"{lleft} - {rright}"
+                        elif instruction.Type == 152:
+                            right = f"{lleft} * {rright}"
+                        elif instruction.Type == 153:
+                            right = f"{lleft} / {rright}"
+                        elif instruction.Type == 154:
+                            right = f"{lleft} % {rright}"
+                        elif instruction.Type == 160:
+                            right = f"{lleft} & {rright}"
+                        elif instruction.Type == 161:
+                            right = f"{lleft} | {rright}"
+                        elif instruction.Type == 162:
+                            right = f"{lleft} ^ {rright}"
+                        elif instruction.Type == 170:
+                            right = f"{lleft} << {rright}"
+                        elif instruction.Type == 171:
+                            right = f"{lleft} >> {rright}"
+                    elif instruction.Type == 250:
+                        equalsOperator = "+="
+                        right = CreateValueExpression(argument.Value, argument.Type, argument.RawArgumentType)
+                    elif instruction.Type == 251:
+                        equalsOperator = "-="
+                        right = CreateValueExpression(argument.Value, argument.Type, argument.RawArgumentType)
+                    elif instruction.Type == 252:
+                        equalsOperator = "*="
+                        right = CreateValueExpression(argument.Value, argument.Type, argument.RawArgumentType)
+                    elif instruction.Type == 253:
+                        equalsOperator = "/="
+                        right = CreateValueExpression(argument.Value, argument.Type, argument.RawArgumentType)
+                    elif instruction.Type == 254:
+                        equalsOperator = "%="
+                        right = CreateValueExpression(argument.Value, argument.Type, argument.RawArgumentType)
+                    elif instruction.Type == 260:
+                        equalsOperator = "&="
+                        right = CreateValueExpression(argument.Value, argument.Type, argument.RawArgumentType)
+                    elif instruction.Type == 261:
+                        equalsOperator = "|="
+                        right = CreateValueExpression(argument.Value, argument.Type, argument.RawArgumentType)
+                    elif instruction.Type == 262:
+                        equalsOperator = "^="
+                        right = CreateValueExpression(argument.Value, argument.Type, argument.RawArgumentType)
+                    elif instruction.Type == 270:
+                        equalsOperator = "<<="
+                        right = CreateValueExpression(argument.Value, argument.Type, argument.RawArgumentType)
+                    elif instruction.Type == 271:
+                        equalsOperator = ">>="
+                        right = CreateValueExpression(argument.Value, argument.Type, argument.RawArgumentType)
+                    elif instruction.Type in (511, 512, 513):
+                        print("OH MY GOD A CAST VALUE EXPRESSION")
+                        pass
+                        #castValue = CreateValueExpression(argument.Value, argument.Type, argument.RawArgumentType)
+                    elif instruction.Type == 523:
+                        print("OH MY GOD A SWITCH STATEMENT")
+                        pass
+                    elif instruction.Type == 530:
+                        print("OH MY GOD A 'new' KEYWORD")
+                        pass
+                    elif instruction.Type == 531:
+                        indexes = script.Arguments[
+                                instruction.ArgumentIndex + 1:(instruction.ArgumentIndex + 1) + instruction.ArgumentCount - 1]
+                        right = CreateArrayIndexExpression(argument, indexes)
+                    else: # Function calls (WIP)
+                        pass
+                        #identifier = ""
+                        #if not (instruction.Type != 20 or instruction.ArgumentCount <= 0):
+                        #    identifier = str(script.Arguments[instruction.ArgumentIndex].Value)
+                    out.write("\t" * t + f"{left} {equalsOperator} {right}\n")
+
+            instructionEndIndex = function.InstructionIndex + function.InstructionCount
+            if jumpLookup.get(instructionEndIndex):
+                for jump in jumpLookup[instructionEndIndex]:
+                    out.write(f'"{jump.Name}":\n')
+
+            out.write("\n")
+    
+    out.close()
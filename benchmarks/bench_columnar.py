@@ -0,0 +1,26 @@
+# Reloading a script: full open_xseq parse versus mapping a columnar export.
+import os
+import sys
+import tempfile
+
+import synthetic
+from columnar import load_columnar, save_columnar
+from xseq import *
+from timing import measure
+
+def main(instructionCount=6_000):
+    with tempfile.TemporaryDirectory() as directory:
+        for method in ("none", "lz10", "zlib"):
+            data = synthetic.make_script(instructionCount, compress=synthetic.COMPRESSORS[method])
+            path = os.path.join(directory, f"{method}.xqc")
+            parse, script = measure(lambda: open_xseq(data))
+            save_columnar(path, script)
+            load, loaded = measure(lambda: load_columnar(path))
+            # Touch every row so lazily decoded strings are counted too.
+            scan, _ = measure(lambda: [argument.Value for argument in loaded.Arguments])
+            print(f"{method:>5}: parse {parse * 1000:7.2f} ms, load {load * 1000:6.3f} ms "
+                  f"({parse / load:,.0f}x), load + read all arguments {(load + scan) * 1000:6.2f} ms, "
+                  f"{len(data):,} bytes as .xq, {os.path.getsize(path):,} as .xqc")
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
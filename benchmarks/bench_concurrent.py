@@ -0,0 +1,25 @@
+# Table decompression in open_xseq: one after another versus the shared thread pool.
+import sys
+
+import synthetic
+from compression import compressor
+from xseq import ReadContainer, GetTablePool
+from timing import measure
+
+def main(instructionCount=6_000):
+    # Tables under ConcurrentMinimumSize stay on the calling thread, so the
+    # default script measures the overhead; pass a larger count (up to about
+    # 8000 instructions fit the header) for ZLib tables that use the pool.
+    pool = GetTablePool()
+    for method, name in ((5, "ZLib"), (1, "Lz10"), (3, "Huffman8")):
+        data = memoryview(synthetic.make_script(
+            instructionCount, synthetic.PointerLength.Long,
+            compress=lambda table: compressor.compress(table, method)))
+        sequential, (expected, _) = measure(lambda: ReadContainer(data))
+        concurrent, (container, _) = measure(lambda: ReadContainer(data, pool))
+        assert bytes(container.ArgumentTable.Data) == bytes(expected.ArgumentTable.Data)
+        print(f"{name:>9}: {len(data):>7,} bytes, sequential {sequential * 1000:7.2f} ms, "
+              f"concurrent {concurrent * 1000:7.2f} ms, {sequential / concurrent:.2f}x")
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
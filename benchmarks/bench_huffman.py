@@ -0,0 +1,35 @@
+# Level5 Huffman4/Huffman8 decompression, bitwise tree walk versus lookup tables.
+import sys
+
+import synthetic
+import _legacy
+from compression import huffman
+from timing import measure
+
+def compare(name, data, bit_depth):
+    compressed = huffman.compress(data, bit_depth)
+    table, result = measure(lambda: huffman.decompress(compressed, bit_depth), repeat=3)
+    bitwise, expected = measure(lambda: _legacy.huffman_decompress(compressed, bit_depth), repeat=1)
+    assert result == expected == data
+
+    print(f"{name:>12} Huffman{bit_depth}: {len(data):>7,} -> {len(compressed):>7,} bytes, "
+          f"bitwise {bitwise * 1000:8.2f} ms, table {table * 1000:7.2f} ms, {bitwise / table:5.1f}x")
+
+def main(instructionCount=8_000):
+    tables = synthetic.ScriptBuilder(synthetic.PointerLength.Int)
+    for i in range(instructionCount // 64):
+        tables.function(i, 64)
+    for bit_depth in (4, 8):
+        compare("all tables", b"".join(tables.tables()), bit_depth)
+
+    # Most tables are compressed on their own and are small, so the cost of
+    # building lookup rows matters as much as the decoding loop.
+    small = synthetic.ScriptBuilder(synthetic.PointerLength.Int)
+    for i in range(3_000 // 64):
+        small.function(i, 64)
+    for name, data in zip(("function", "jump", "instruction", "argument", "string"), small.tables()):
+        for bit_depth in (4, 8):
+            compare(name, data, bit_depth)
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
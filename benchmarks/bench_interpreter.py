@@ -0,0 +1,91 @@
+# Interpreter throughput in instructions per second, on a counting loop, a
+# recursive function and the random functions of a synthetic script.
+import sys
+import time
+
+import synthetic
+from xseq import *
+from xseq_interpreter import Interpreter, ScriptError
+from timing import measure
+
+def local(index):
+    return (4, 1000 + index)
+
+def param(index):
+    return (4, 3000 + index)
+
+def add_function(builder, name, parameterCount, body, labels=()):
+    # `body` is a list of (type, return variable, arguments) and `labels`
+    # maps label names to the position in `body` they mark.
+    start = len(builder.instructions)
+    jumpStart = len(builder.jumps)
+    for label, position in labels:
+        builder.jumps.append((builder.string(label), synthetic.name_hash(label), start + position))
+    for instructionType, returnParameter, arguments in body:
+        builder.instruction(instructionType, returnParameter, arguments)
+    builder.functions.append((builder.string(name), synthetic.name_hash(name), start, len(builder.instructions),
+                              jumpStart, len(labels), 8, 0, parameterCount))
+
+def make_program():
+    builder = synthetic.ScriptBuilder(PointerLength.Int)
+    end, loop, skip = ((2, synthetic.name_hash(label)) for label in ("end", "loop", "skip"))
+    # count(n): sum of range(n) plus one for every i not divisible by 3.
+    add_function(builder, "count", 1, [
+        (100, 1000, [(1, 0)]),
+        (100, 1001, [(1, 0)]),
+        (135, 1002, [local(0), param(0)]),
+        (33, 0, [end, local(2)]),
+        (250, 1001, [local(0)]),
+        (154, 1003, [local(0), (1, 3)]),
+        (33, 0, [skip, local(3)]),
+        (240, 1001, []),
+        (240, 1000, []),
+        (31, 0, [loop]),
+        (11, 0, [local(1)]),
+    ], [("loop", 2), ("skip", 8), ("end", 10)])
+    # fib(n), recursively.
+    add_function(builder, "fib", 1, [
+        (134, 1000, [param(0), (1, 1)]),
+        (30, 0, [(2, synthetic.name_hash("recurse")), local(0)]),
+        (11, 0, [param(0)]),
+        (141, 1001, [param(0)]),
+        (20, 1002, [(2, synthetic.name_hash("fib")), local(1)]),
+        (141, 1001, [local(1)]),
+        (20, 1003, [(2, synthetic.name_hash("fib")), local(1)]),
+        (150, 1004, [local(2), local(3)]),
+        (11, 0, [local(4)]),
+    ], [("recurse", 3)])
+    return open_xseq(builder.build())
+
+def run(interpreter, name, *params):
+    interpreter.Steps = 0
+    try:
+        result = interpreter.Run(name, *params)
+    except ScriptError:
+        result = None
+    return interpreter.Steps, result
+
+def main(iterations=200_000, fib=22, instructionCount=6_000):
+    interpreter = Interpreter(make_program())
+    elapsed, (steps, result) = measure(lambda: run(interpreter, "count", iterations), repeat=3)
+    assert result == sum(range(iterations)) + sum(1 for i in range(iterations) if i % 3), result
+    print(f"   count({iterations}): {steps:>10,} instructions, {steps / elapsed / 1e6:5.2f} M/s")
+
+    elapsed, (steps, result) = measure(lambda: run(interpreter, "fib", fib), repeat=3)
+    assert result == (lambda f: f(f, fib))(lambda f, n: n if n <= 1 else f(f, n - 1) + f(f, n - 2)), result
+    print(f"        fib({fib}): {steps:>10,} instructions, {steps / elapsed / 1e6:5.2f} M/s")
+
+    # Random code: runs end on type errors, the call depth or the step limit,
+    # and native calls return 0.
+    script = open_xseq(synthetic.make_script(instructionCount))
+    start = time.perf_counter()
+    interpreter = Interpreter(script, default=lambda interpreter, key, arguments: 0, maxSteps=100_000)
+    compile = time.perf_counter() - start
+    start = time.perf_counter()
+    steps = sum(run(interpreter, function.Name)[0] for function in script.Functions)
+    elapsed = time.perf_counter() - start
+    print(f"synthetic {instructionCount:>5}: {steps:>10,} instructions, {steps / elapsed / 1e6:5.2f} M/s, "
+          f"compiled in {compile * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
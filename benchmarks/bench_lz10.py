@@ -0,0 +1,32 @@
+# LZ10 compression: the legacy byte-by-byte window search versus the
+# rfind-based match finder at the Fast, Lazy and Optimal levels.
+import sys
+import time
+
+import synthetic
+import _legacy
+from compression import lz10, lzss
+
+def main(instructionCount=9_600):
+    tables = synthetic.ScriptBuilder(synthetic.PointerLength.Long)
+    for i in range(instructionCount // 64):
+        tables.function(i, 64)
+    data = b"".join(tables.tables())
+    megabytes = len(data) / 2**20
+
+    candidates = [("window search", _legacy.lz10_compress)]
+    for name in ("Fast", "Lazy", "Optimal"):
+        level = getattr(lz10.Lz10Level, name)
+        candidates.append((name, lambda data, level=level: lz10.compress(data, level)))
+
+    print(f"{len(data):,} bytes of script tables")
+    for name, compress in candidates:
+        start = time.perf_counter()
+        compressed = compress(data)
+        elapsed = time.perf_counter() - start
+        assert lzss.lzss_decompress(compressed)[:len(data)] == data
+        print(f"{name:>14}: {len(compressed):>9,} bytes ({len(compressed) / len(data):6.1%}), "
+              f"{elapsed:6.2f} s, {megabytes / elapsed:6.2f} MiB/s")
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,30 @@
+# Resident size of a parsed ScriptFile: object lists versus columnar tables.
+import gc
+import sys
+import tracemalloc
+
+import synthetic
+from columnar import open_xseq_columnar
+from xseq import *
+
+def retained(open_function, data):
+    gc.collect()
+    tracemalloc.start()
+    script = open_function(BytesIO(data))
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size, script
+
+def main(instructionCount=6_000):
+    for length in PointerLength:
+        data = synthetic.make_script(instructionCount, length)
+        for name, open_function in (("objects", open_xseq), ("columnar", open_xseq_columnar)):
+            size, script = retained(open_function, data)
+            perMillion = size / len(script.Instructions) * 1_000_000
+            print(f"{length.name:>4} {name:>8}: {size / 2**20:8.2f} MiB for {len(script.Instructions):,} instructions"
+                  f" / {len(script.Arguments):,} arguments, {perMillion / 2**20:8.1f} MiB per million instructions")
+            del script
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,55 @@
+# Batch runs with fresh buffers per table versus a shared BufferPool, for the
+# decompression stage alone and for whole parses, plus the memory a batch
+# allocates as traced by tracemalloc.
+import sys
+import tracemalloc
+
+import synthetic
+from xseq import *
+from timing import measure
+
+def read_batch(scripts, buffers):
+    for data in scripts:
+        container, _ = ReadContainer(memoryview(data), buffers=buffers)
+        if buffers is not None:
+            buffers.ReleaseContainer(container)
+
+def parse_batch(scripts, buffers):
+    for data in scripts:
+        open_xseq(data, buffers=buffers)
+
+def traced(function):
+    # Bytes still held after the call, and the peak while it ran.
+    tracemalloc.start()
+    function()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current, peak
+
+def main(instructionCount=4_000):
+    for method in ("lz10", "huffman8", "rle", "zlib"):
+        # Scripts of different sizes, as in a real corpus.
+        scripts = [synthetic.make_script(instructionCount * (i + 1) // 8, seed=i,
+                                         compress=synthetic.COMPRESSORS[method]) for i in range(8)]
+        buffers = BufferPool()
+        read, _ = measure(lambda: read_batch(scripts, None))
+        pooledRead, _ = measure(lambda: read_batch(scripts, buffers))
+        parse, _ = measure(lambda: parse_batch(scripts, None), 3)
+        pooledParse, _ = measure(lambda: parse_batch(scripts, buffers), 3)
+        # Fresh buffers allocate every decompressed table on every run; the
+        # pool is warm by now, so a pooled batch only allocates transients.
+        containers = [ReadContainer(memoryview(data))[0] for data in scripts]
+        decompressed = sum(len(table.Data) for container in containers
+                           for table in (container.FunctionTable, container.JumpTable, container.InstructionTable,
+                                         container.ArgumentTable, container.StringTable))
+        _, peak = traced(lambda: read_batch(scripts, None))
+        _, pooledPeak = traced(lambda: read_batch(scripts, buffers))
+        arenas = sum(len(arena) for arena in buffers.Free)
+        print(f"{method:>8}: decompress {read * 1000:7.2f} ms, pooled {pooledRead * 1000:7.2f} ms "
+              f"({read / pooledRead:.2f}x) | parse {parse * 1000:7.1f} ms, pooled {pooledParse * 1000:7.1f} ms "
+              f"({parse / pooledParse:.2f}x) | {decompressed / 1024:,.0f} KiB decompressed per batch, "
+              f"peak {peak / 1024:,.0f} KiB, pooled {pooledPeak / 1024:,.0f} KiB | "
+              f"{buffers.Allocated} arenas ({arenas / 1024:,.0f} KiB) for {buffers.Allocated + buffers.Reused} tables")
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
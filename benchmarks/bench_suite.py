@@ -0,0 +1,110 @@
+# Every stage of decompiling, per pointer length and compression method, as JSON.
+#   python bench_suite.py -o results.json [--baseline previous.json]
+import argparse
+import json
+import os
+import platform
+import tempfile
+
+import synthetic
+from xseq import *
+from timing import measure
+
+STAGES = ("decompress", "tables", "strings", "to_txt")
+
+def StringOffsets(container, length):
+    # Every string the decoders look up: function and jump names and
+    # string arguments, in table order.
+    offsets = [function.nameOffset for function in ReadEntries(container.FunctionTable, XseqFunction, length)]
+    offsets += [jump.nameOffset for jump in ReadEntries(container.JumpTable, XseqJump, length)]
+    offsets += [argument.value for argument in ReadEntries(container.ArgumentTable, XseqArgument, length)
+                if argument.type in (24, 25)]
+    return offsets
+
+def DecodeTables(container, strings, length):
+    context = ParseContext()
+    functions = ReadFunctions(container.FunctionTable, strings, length, context)
+    jumps = ReadJumps(container.JumpTable, strings, length, context)
+    instructions = ReadInstructions(container.InstructionTable, length)
+    arguments = ReadArguments(container.ArgumentTable, instructions, strings, length, context)
+    return ScriptFile((functions, jumps, instructions, arguments, length))
+
+def ResolveStrings(data, offsets):
+    strings = ScriptStringTable(data)
+    for offset in offsets:
+        strings.GetString(offset)
+    return strings
+
+def run(instructionCount, length, method, repeat, directory):
+    data = memoryview(synthetic.make_script(instructionCount, length, compress=synthetic.COMPRESSORS[method]))
+    times = {}
+
+    times["decompress"], (container, detected) = measure(lambda: ReadContainer(data), repeat)
+    assert detected == length
+
+    # Names and strings are memoized per string table, so table decoding is
+    # timed against a table that has already resolved them all, and string
+    # resolution separately against a fresh one.
+    offsets = StringOffsets(container, length)
+    stringData = container.StringTable.Data
+    times["strings"], strings = measure(lambda: ResolveStrings(stringData, offsets), repeat)
+    times["tables"], script = measure(lambda: DecodeTables(container, strings, length), repeat)
+
+    path = os.path.join(directory, "script.txt")
+    times["to_txt"], _ = measure(lambda: to_txt(path, script), repeat)
+
+    return {
+        "length": length.name,
+        "method": method,
+        "instructions": len(script.Instructions),
+        "arguments": len(script.Arguments),
+        "bytes": len(data),
+        "seconds": times,
+    }
+
+def compare(results, baseline):
+    previous = {(r["length"], r["method"], r["instructions"]): r for r in baseline["results"]}
+    for result in results:
+        old = previous.get((result["length"], result["method"], result["instructions"]))
+        if old is None:
+            continue
+        ratios = "  ".join(f"{stage} {old['seconds'][stage] / result['seconds'][stage]:5.2f}x"
+                           for stage in STAGES if stage in old["seconds"])
+        print(f"{result['length']:>4} {result['method']:>8} {result['instructions']:>6}: {ratios}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time every decompile stage on synthetic scripts.")
+    parser.add_argument("-o", "--output", help="JSON file to write results to")
+    parser.add_argument("--baseline", help="earlier JSON results to print speedups against")
+    parser.add_argument("--instructions", type=int, nargs="+", default=[1_000, 6_000])
+    parser.add_argument("--method", nargs="+", choices=list(synthetic.COMPRESSORS), default=list(synthetic.COMPRESSORS))
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for instructionCount in args.instructions:
+            for length in PointerLength:
+                for method in args.method:
+                    result = run(instructionCount, length, method, args.repeat, directory)
+                    results.append(result)
+                    seconds = result["seconds"]
+                    print(f"{length.name:>4} {method:>8} {result['instructions']:>6} instructions: " +
+                          "  ".join(f"{stage} {seconds[stage] * 1000:8.2f} ms" for stage in STAGES))
+
+    report = {
+        "decompilerVersion": DecompilerVersion,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+    if args.baseline:
+        with open(args.baseline) as file:
+            compare(results, json.load(file))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+# Table reading: per-field BytesIO reads versus Struct.iter_unpack.
+import sys
+
+import synthetic
+import _legacy
+from xseq import *
+from timing import measure
+
+def main(count=200_000):
+    strings = ScriptStringTable(b"\x00")
+    for length in PointerLength:
+        instructionTable = synthetic.make_instruction_table(count, length)
+        argumentCount = min(count * 2, synthetic.MAX_ARGUMENTS)
+        argumentTable = synthetic.make_argument_table(argumentCount, length)
+
+        bulk, instructions = measure(lambda: ReadInstructions(instructionTable, length), repeat=3)
+        bulkArgs, arguments = measure(lambda: ReadArguments(argumentTable, instructions, strings, length, ParseContext()), repeat=3)
+        print(f"{length.name:>4} bulk:   {count / bulk:>12,.0f} instructions/s  {argumentCount / bulkArgs:>12,.0f} arguments/s")
+
+        # The per-field readers only ever handled PointerLength.Int correctly.
+        if length != PointerLength.Int:
+            continue
+        legacy, legacyInstructions = measure(lambda: _legacy.ReadInstructions(instructionTable, length), repeat=3)
+        legacyArgs, legacyArguments = measure(lambda: _legacy.ReadArguments(argumentTable, legacyInstructions, strings, length, ParseContext()), repeat=3)
+        print(f"{length.name:>4} legacy: {count / legacy:>12,.0f} instructions/s  {argumentCount / legacyArgs:>12,.0f} arguments/s")
+        print(f"{length.name:>4} speedup: {legacy / bulk:.1f}x instructions, {legacyArgs / bulkArgs:.1f}x arguments")
+
+        assert [vars(i) for i in instructions] == [vars(i) for i in legacyInstructions]
+        assert [vars(a) for a in arguments] == [vars(a) for a in legacyArguments]
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,27 @@
+# to_txt rendering: if/elif chain with per-line writes versus dispatch table.
+import os
+import sys
+import tempfile
+
+import synthetic
+import _legacy
+from xseq import *
+from timing import measure
+
+def main(instructionCount=8_000, repeat=3):
+    script = open_xseq(synthetic.make_script(instructionCount))
+    count = len(script.Instructions)
+
+    with tempfile.TemporaryDirectory() as directory:
+        before = os.path.join(directory, "before.txt")
+        after = os.path.join(directory, "after.txt")
+        legacy, _ = measure(lambda: _legacy.to_txt(before, script), repeat)
+        table, _ = measure(lambda: to_txt(after, script), repeat)
+        with open(before, "rb") as a, open(after, "rb") as b:
+            assert a.read() == b.read()
+
+    print(f"{count:,} instructions: if/elif {count / legacy:,.0f} instructions/s, "
+          f"dispatch table {count / table:,.0f} instructions/s, {legacy / table:.1f}x")
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,55 @@
+# Parse one corpus on many threads at once and check every result matches a
+# single-threaded parse, i.e. that parses share no state.
+from concurrent.futures import ThreadPoolExecutor
+import glob
+import os
+import sys
+import tempfile
+import time
+
+import synthetic
+from compression import compressor
+from xseq import PointerLength, open_xseq, to_txt
+
+def render(data, directory, name):
+    path = os.path.join(directory, name)
+    to_txt(path, open_xseq(data))
+    with open(path, "rb") as file:
+        return file.read()
+
+def make_corpus(count):
+    corpus = {}
+    for seed in range(count):
+        length = PointerLength(seed % 2)
+        method = compressor.METHODS[seed % len(compressor.METHODS)]
+        corpus[f"synthetic{seed}"] = synthetic.make_script(
+            1_000 + seed * 97 % 2_000, length, seed=seed,
+            compress=lambda table: compressor.compress(table, method))
+    return corpus
+
+def main(threads=8, rounds=4, *paths):
+    if paths:
+        corpus = {}
+        for path in paths:
+            for source in glob.glob(path, recursive=True):
+                with open(source, "rb") as file:
+                    corpus[os.path.basename(source)] = file.read()
+    else:
+        corpus = make_corpus(24)
+
+    with tempfile.TemporaryDirectory() as directory:
+        expected = {name: render(data, directory, name + ".expected") for name, data in corpus.items()}
+
+        work = [(name, round) for round in range(rounds) for name in corpus]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            results = executor.map(lambda item: (item[0], render(corpus[item[0]], directory, f"{item[0]}.{item[1]}")), work)
+            mismatches = [name for name, text in results if text != expected[name]]
+        elapsed = time.perf_counter() - start
+
+    print(f"{len(work)} parses of {len(corpus)} scripts on {threads} threads in {elapsed:.2f} s, "
+          f"{len(mismatches)} mismatches")
+    return 1 if mismatches else 0
+
+if __name__ == "__main__":
+    sys.exit(main(*map(int, sys.argv[1:3]), *sys.argv[3:]))
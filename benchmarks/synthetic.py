@@ -0,0 +1,193 @@
+# Synthetic XSEQ data for the benchmarks. Run directly to write .xq files:
+#   python synthetic.py out/ --instructions 1000 6000 --length Int Long --method none lz10
+import argparse
+import os
+import random
+import sys
+from struct import pack, unpack
+from os import path
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+
+from compression import compressor
+from namehash import Crc16
+from xseq import *
+
+ARGUMENT_TYPES = (1, 2, 3, 4)
+INSTRUCTION_TYPES = (100, 130, 150, 151, 152, 250)
+
+# ArgumentIndex is an int16, so instructions past this many arguments wrap
+# around and share the argument table from the start.
+MAX_ARGUMENTS = 0x8000
+
+# How each table is stored, by the name used in benchmark results. "none"
+# writes raw tables without a Level5 header, like uncompressed game files.
+COMPRESSORS = {
+    "none": lambda table: table,
+    "lz10": lambda table: compressor.compress(table, 1),
+    "huffman4": lambda table: compressor.compress(table, 2),
+    "huffman8": lambda table: compressor.compress(table, 3),
+    "rle": lambda table: compressor.compress(table, 4),
+    "zlib": lambda table: compressor.compress(table, 5),
+}
+
+def make_instruction_table(count, length, argumentsPerInstruction=2, seed=0):
+    rng = random.Random(seed)
+    layout = XseqInstruction.layouts[length]
+    data = bytearray()
+    for i in range(count):
+        data += layout.pack(
+            i * argumentsPerInstruction % MAX_ARGUMENTS,
+            argumentsPerInstruction,
+            1000 + rng.randrange(16),
+            rng.choice(INSTRUCTION_TYPES),
+            0,
+        )
+    return ScriptTable((count, memoryview(bytes(data))))
+
+def make_argument_table(count, length, seed=0):
+    rng = random.Random(seed)
+    layout = XseqArgument.layouts[length]
+    data = bytearray()
+    for i in range(count):
+        data += layout.pack(rng.choice(ARGUMENT_TYPES), rng.getrandbits(16))
+    return ScriptTable((count, memoryview(bytes(data))))
+
+def name_hash(name):
+    return Crc16(name.encode("shift-jis"))
+
+class ScriptBuilder:
+    def __init__(self, length, seed=0):
+        self.length = length
+        self.rng = random.Random(seed)
+        self.functions = []
+        self.jumps = []
+        self.instructions = []
+        self.arguments = []
+        self.strings = bytearray(b"\x00")
+        self.stringOffsets = {"": 0}
+
+    def string(self, text):
+        offset = self.stringOffsets.get(text)
+        if offset is None:
+            offset = self.stringOffsets[text] = len(self.strings)
+            self.strings += text.encode("shift-jis") + b"\x00"
+        return offset
+
+    def instruction(self, instructionType, returnParameter, arguments):
+        self.instructions.append((len(self.arguments), len(arguments), returnParameter, instructionType, 0))
+        self.arguments.extend(arguments)
+
+    def variable(self):
+        return (4, self.rng.choice((1000, 2000, 3000, 4000)) + self.rng.randrange(8))
+
+    def value(self):
+        kind = self.rng.randrange(5)
+        if kind == 0:
+            return (1, self.rng.getrandbits(16))
+        elif kind == 1:
+            return (3, unpack("<I", pack("<f", self.rng.random() * 100))[0])
+        elif kind == 2:
+            return (24, self.string(f"text{self.rng.randrange(64)}"))
+        return self.variable()
+
+    def function(self, index, instructionCount):
+        rng = self.rng
+        name = f"function{index}"
+        labels = [f"{name}_label{i}" for i in range(max(1, instructionCount // 16))]
+        start = len(self.instructions)
+        jumpStart = len(self.jumps)
+        for label in labels:
+            self.jumps.append((self.string(label), name_hash(label), start + rng.randrange(instructionCount)))
+
+        for i in range(instructionCount - 1):
+            kind = rng.randrange(10)
+            target = (2, name_hash(rng.choice(labels)))
+            ret = rng.choice((1000, 2000, 4000)) + rng.randrange(8)
+            if kind == 0:
+                self.instruction(rng.choice((30, 33)), 0, [target, self.variable()])
+            elif kind == 1:
+                self.instruction(31, 0, [target])
+            elif kind == 2:
+                self.instruction(rng.choice((110, 112, 120)), ret, [self.value()])
+            elif kind == 3:
+                self.instruction(rng.choice((240, 241)), ret, [(1, rng.randrange(4))])
+            elif kind == 4:
+                self.instruction(531, ret, [self.variable(), (1, rng.randrange(4))])
+            elif kind == 5:
+                self.instruction(20, ret, [(2, name_hash(f"function{rng.randrange(index + 1)}")), self.value()])
+            elif kind == 6:
+                self.instruction(rng.choice((250, 251, 252, 260, 270)), ret, [self.value()])
+            elif kind == 7:
+                self.instruction(10, 0, [])
+            else:
+                self.instruction(rng.choice((100, 121, 130, 134, 140, 150, 152, 154, 161, 171)), ret, [self.value(), self.value()])
+        self.instruction(11, 0, [(1, 0)])
+
+        self.functions.append((
+            self.string(name), name_hash(name),
+            start, len(self.instructions),
+            jumpStart, len(self.jumps) - jumpStart,
+            rng.randrange(8), rng.randrange(8), rng.randrange(4),
+        ))
+
+    def tables(self):
+        length = self.length
+        return (
+            b"".join(XseqFunction.layouts[length].pack(*f) for f in self.functions),
+            b"".join(XseqJump.layouts[length].pack(*j) for j in self.jumps),
+            b"".join(XseqInstruction.layouts[length].pack(*i) for i in self.instructions),
+            b"".join(XseqArgument.layouts[length].pack(*a) for a in self.arguments),
+            bytes(self.strings),
+        )
+
+    def build(self, compress=None, globalVariableCount=8):
+        # By default tables are stored behind a Level5 header without being
+        # compressed; pass `lambda table: table` for raw tables.
+        if compress is None:
+            compress = lambda table: pack("<I", len(table) << 3) + table
+
+        blobs = [compress(table) for table in self.tables()]
+        offsets = []
+        data = bytearray(24)
+        for blob in blobs:
+            offsets.append(len(data) >> 2)
+            data += blob
+            data += bytes(-len(data) % 4)
+
+        data[:24] = XseqHeader.strct.pack(
+            b"XSEQ",
+            len(self.functions), offsets[0],
+            offsets[1], len(self.jumps),
+            offsets[2], len(self.instructions),
+            offsets[3], len(self.arguments),
+            globalVariableCount, offsets[4],
+        )
+        return bytes(data)
+
+def make_script(instructionCount, length=PointerLength.Int, instructionsPerFunction=64, seed=0, compress=None):
+    builder = ScriptBuilder(length, seed)
+    for i in range(max(1, instructionCount // instructionsPerFunction)):
+        builder.function(i, instructionsPerFunction)
+    return builder.build(compress)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write synthetic .xq files.")
+    parser.add_argument("output", help="output directory")
+    parser.add_argument("--instructions", type=int, nargs="+", default=[1_000, 6_000])
+    parser.add_argument("--length", nargs="+", choices=[length.name for length in PointerLength],
+                        default=[length.name for length in PointerLength])
+    parser.add_argument("--method", nargs="+", choices=list(COMPRESSORS), default=list(COMPRESSORS))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.output, exist_ok=True)
+    for count in args.instructions:
+        for length in args.length:
+            for method in args.method:
+                data = make_script(count, PointerLength[length], seed=args.seed, compress=COMPRESSORS[method])
+                with open(os.path.join(args.output, f"synthetic_{length}_{method}_{count}.xq"), "wb") as file:
+                    file.write(data)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+# Shared timing helper for the bench_*.py scripts.
+import time
+
+def measure(function, repeat=5):
+    """Return the best time of `repeat` calls and the result of the last one."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
@@ -0,0 +1,82 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+
+from xseq import DecompilerVersion
+
+class DecompileCache:
+    """
+    Decompiled text on disk, keyed by a hash of the raw script, the
+    decompiler version and a salt for anything else the output depends on
+    (such as the name dictionary). Entries are stored as <directory>/<ab>/<key>.txt.
+    A hit refreshes the entry's modification time, and Evict removes the
+    least recently used entries until the cache fits in MaxSize bytes.
+    It also deletes temporary files that an interrupted Put left behind.
+    """
+
+    # Seconds after which a .tmp file can no longer belong to a Put in progress.
+    StaleTemporaryAge = 600
+
+    def __init__(self, directory, maxSize, salt=b""):
+        self.Directory = directory
+        self.MaxSize = maxSize
+        self.Salt = salt
+
+    def Key(self, data):
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(f"monada-{DecompilerVersion}\0".encode())
+        digest.update(self.Salt)
+        digest.update(data)
+        return digest.hexdigest()
+
+    def GetPath(self, key):
+        return os.path.join(self.Directory, key[:2], key + ".txt")
+
+    def Get(self, key, destination):
+        path = self.GetPath(key)
+        try:
+            shutil.copyfile(path, destination)
+            os.utime(path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def Put(self, key, source):
+        path = self.GetPath(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Copy next to the entry and rename, so readers never see half a file.
+        handle, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        os.close(handle)
+        try:
+            shutil.copyfile(source, temporary)
+            os.replace(temporary, path)
+        except BaseException:
+            os.remove(temporary)
+            raise
+
+    def Evict(self):
+        entries = []
+        staleBefore = time.time() - self.StaleTemporaryAge
+        for root, _, files in os.walk(self.Directory):
+            for name in files:
+                if name.endswith(".tmp"):
+                    path = os.path.join(root, name)
+                    try:
+                        if os.stat(path).st_mtime < staleBefore:
+                            os.remove(path)
+                    except FileNotFoundError:
+                        # Renamed or removed by its writer meanwhile.
+                        pass
+                elif name.endswith(".txt"):
+                    path = os.path.join(root, name)
+                    stat = os.stat(path)
+                    entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.MaxSize:
+                break
+            os.remove(path)
+            total -= size
@@ -0,0 +1,349 @@
+from array import array
+from struct import Struct
+from time import perf_counter
+import mmap
+import sys
+
+from xseq import *
+
+# Argument types are stored as their ScriptArgumentType value, with this
+# code standing in for arguments whose type was not recognised (None).
+NoArgumentType = -2
+ArgumentTypes = {argumentType.value: argumentType for argumentType in ScriptArgumentType}
+ArgumentTypes[NoArgumentType] = None
+
+def Column(name):
+    return property(lambda row: getattr(row._table, name)[row._index])
+
+class ColumnTable:
+    __slots__ = ("Count",)
+    Row = None
+
+    def __len__(self):
+        return self.Count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.Row(self, i) for i in range(*index.indices(self.Count))]
+        if index < 0:
+            index += self.Count
+        if not 0 <= index < self.Count:
+            raise IndexError("table index out of range")
+        return self.Row(self, index)
+
+    def __iter__(self):
+        for i in range(self.Count):
+            yield self.Row(self, i)
+
+class Row:
+    __slots__ = ("_table", "_index")
+    def __init__(self, table, index):
+        self._table = table
+        self._index = index
+
+class FunctionRow(Row):
+    __slots__ = ()
+    Name = Column("Name")
+    InstructionIndex = Column("InstructionIndex")
+    InstructionCount = Column("InstructionCount")
+    JumpIndex = Column("JumpIndex")
+    JumpCount = Column("JumpCount")
+    ParameterCount = Column("ParameterCount")
+    LocalCount = Column("LocalCount")
+    ObjectCount = Column("ObjectCount")
+class FunctionColumns(ColumnTable):
+    __slots__ = ("Name", "InstructionIndex", "InstructionCount", "JumpIndex", "JumpCount",
+                 "ParameterCount", "LocalCount", "ObjectCount")
+    Row = FunctionRow
+    def __init__(self, functions):
+        self.Count = len(functions)
+        self.Name = [function.Name for function in functions]
+        for name in self.__slots__[1:]:
+            setattr(self, name, array("l", (getattr(function, name) for function in functions)))
+
+class JumpRow(Row):
+    __slots__ = ()
+    Name = Column("Name")
+    InstructionIndex = Column("InstructionIndex")
+class JumpColumns(ColumnTable):
+    __slots__ = ("Name", "InstructionIndex")
+    Row = JumpRow
+    def __init__(self, jumps):
+        self.Count = len(jumps)
+        self.Name = [jump.Name for jump in jumps]
+        self.InstructionIndex = array("l", (jump.InstructionIndex for jump in jumps))
+
+class InstructionRow(Row):
+    __slots__ = ()
+    ArgumentIndex = Column("ArgumentIndex")
+    ArgumentCount = Column("ArgumentCount")
+    ReturnParameter = Column("ReturnParameter")
+    Type = Column("Type")
+class InstructionColumns(ColumnTable):
+    __slots__ = ("ArgumentIndex", "ArgumentCount", "ReturnParameter", "Type")
+    Row = InstructionRow
+    def __init__(self, columns):
+        self.ArgumentIndex, self.ArgumentCount, self.ReturnParameter, self.Type = columns
+        self.Count = len(self.Type)
+
+class ArgumentRow(Row):
+    __slots__ = ()
+    @property
+    def RawArgumentType(self):
+        return self._table.RawArgumentType[self._index]
+    @property
+    def Type(self):
+        return ArgumentTypes[self._table.Type[self._index]]
+    @property
+    def Value(self):
+        table = self._table
+        if table.Type[self._index] == NoArgumentType:
+            return None
+        value = table.Value[self._index]
+        if value < 0:
+            return table.Strings[~value]
+        if table.Type[self._index] == ScriptArgumentType.Float.value:
+            return unpack("<f", pack("<I", value))[0]
+        return value
+class ArgumentColumns(ColumnTable):
+    __slots__ = ("RawArgumentType", "Type", "Value", "Strings")
+    Row = ArgumentRow
+    def __init__(self, columns):
+        self.RawArgumentType, self.Type, self.Value, self.Strings = columns
+        self.Count = len(self.Type)
+
+def ReadInstructionColumns(instructionTable, length):
+    stride = GetInstructionEntrySize(length) // 2
+    raw = array("h")
+    raw.frombytes(instructionTable.Data[:stride * 2 * instructionTable.EntryCount])
+    if sys.byteorder == "big":
+        raw.byteswap()
+
+    return InstructionColumns((raw[0::stride], raw[1::stride], raw[2::stride], raw[3::stride]))
+
+def ReadArgumentColumns(argumentTable, instructions, stringTable, length, context):
+    count = argumentTable.EntryCount
+    instructionTypes = [None] * count
+    argumentIndexes = array("h", [0]) * count
+    for index, argumentCount, instructionType in zip(
+            instructions.ArgumentIndex, instructions.ArgumentCount, instructions.Type):
+        for i in range(argumentCount):
+            instructionTypes[index + i] = instructionType
+            argumentIndexes[index + i] = i
+
+    rawTypes = array("b")
+    types = array("b")
+    values = array("q")
+    strings = []
+    stringIndexes = {}
+
+    layout = XseqArgument.layouts[length]
+    entries = layout.iter_unpack(argumentTable.Data[:layout.size * count])
+    for i, (argumentType, argumentValue) in enumerate(entries):
+        rawType, _type, value = CreateArgumentValues(
+            argumentType, argumentValue, instructionTypes[i], argumentIndexes[i], stringTable, context)
+
+        rawTypes.append(rawType)
+        if _type is None:
+            # Unrecognised raw types have no value; 0 stands in for it.
+            types.append(NoArgumentType)
+            values.append(0)
+            continue
+        types.append(_type.value)
+        if isinstance(value, str):
+            index = stringIndexes.get(value)
+            if index is None:
+                index = stringIndexes[value] = len(strings)
+                strings.append(value)
+            values.append(~index)
+        elif _type == ScriptArgumentType.Float:
+            values.append(argumentValue)
+        else:
+            values.append(value)
+
+    return ArgumentColumns((rawTypes, types, values, strings))
+
+def open_xseq_columnar(data, concurrent=False, context=None):
+    context = context or ParseContext()
+    stats = context.Stats
+    container, length = ReadContainer(GetBuffer(data), GetTablePool() if concurrent else None, stats)
+    strings = container.StringTable
+
+    functions = FunctionColumns(ReadTimed(stats, "function", strings,
+                                          ReadFunctions, container.FunctionTable, strings, length, context))
+    jumps = JumpColumns(ReadTimed(stats, "jump", strings,
+                                  ReadJumps, container.JumpTable, strings, length, context))
+    instructions = ReadTimed(stats, "instruction", strings,
+                             ReadInstructionColumns, container.InstructionTable, length)
+    arguments = ReadTimed(stats, "argument", strings,
+                          ReadArgumentColumns, container.ArgumentTable, instructions, strings, length, context)
+
+    return ScriptFile((
+        functions,
+        jumps,
+        instructions,
+        arguments,
+        length,
+    ))
+
+class StringPool:
+    """Strings stored as UTF-8 back to back, decoded on access."""
+
+    def __init__(self, offsets, data):
+        self.Offsets = offsets
+        self.Data = data
+
+    def __len__(self):
+        return len(self.Offsets) - 1
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        return str(self.Data[self.Offsets[index]:self.Offsets[index + 1]], "utf-8")
+
+    @staticmethod
+    def Pack(strings):
+        offsets = array("I", [0])
+        data = bytearray()
+        for string in strings:
+            data += string.encode("utf-8")
+            offsets.append(len(data))
+        return offsets, array("B", data)
+
+def ArgumentColumnsFromRows(arguments):
+    rawTypes = array("b")
+    types = array("b")
+    values = array("q")
+    strings = []
+    stringIndexes = {}
+    for argument in arguments:
+        rawTypes.append(argument.RawArgumentType)
+        types.append(NoArgumentType if argument.Type is None else argument.Type.value)
+        value = argument.Value
+        if argument.Type is None:
+            # As in ReadArgumentColumns, 0 stands in for the missing value.
+            values.append(0)
+        elif isinstance(value, str):
+            index = stringIndexes.get(value)
+            if index is None:
+                index = stringIndexes[value] = len(strings)
+                strings.append(value)
+            values.append(~index)
+        elif argument.Type == ScriptArgumentType.Float:
+            values.append(unpack("<I", pack("<f", value))[0])
+        else:
+            values.append(value)
+    return ArgumentColumns((rawTypes, types, values, strings))
+
+# Columnar script files: a header, a directory of columns, then every column
+# as a little-endian array, each starting on an 8-byte boundary.
+ColumnarMagic = b"XQCF"
+ColumnarVersion = 1
+ColumnarHeader = Struct("<4s H B x I")
+ColumnarEntry = Struct("<32s c 7x Q Q")
+
+# (file column, table attribute, typecode); "*" marks a string pool, stored
+# as an "I" offsets column and a "B" data column.
+ColumnarLayout = {
+    "Functions": [("Name", "*")] + [(name, "i") for name in FunctionColumns.__slots__[1:]],
+    "Jumps": [("Name", "*"), ("InstructionIndex", "i")],
+    "Instructions": [(name, "h") for name in InstructionColumns.__slots__],
+    "Arguments": [("RawArgumentType", "b"), ("Type", "b"), ("Value", "q"), ("Strings", "*")],
+}
+
+def save_columnar(path, script, stats=None):
+    start = perf_counter()
+    tables = {
+        "Functions": script.Functions if isinstance(script.Functions, FunctionColumns) else FunctionColumns(script.Functions),
+        "Jumps": script.Jumps if isinstance(script.Jumps, JumpColumns) else JumpColumns(script.Jumps),
+        "Instructions": script.Instructions if isinstance(script.Instructions, InstructionColumns) else InstructionColumns(
+            tuple(array("h", (getattr(instruction, name) for instruction in script.Instructions))
+                  for name in InstructionColumns.__slots__)),
+        "Arguments": script.Arguments if isinstance(script.Arguments, ArgumentColumns) else ArgumentColumnsFromRows(script.Arguments),
+    }
+
+    columns = []
+    for tableName, layout in ColumnarLayout.items():
+        table = tables[tableName]
+        for name, typecode in layout:
+            values = getattr(table, name)
+            if typecode == "*":
+                offsets, data = StringPool.Pack(values)
+                columns.append((f"{tableName}.{name}.o", offsets))
+                columns.append((f"{tableName}.{name}.s", data))
+            else:
+                columns.append((f"{tableName}.{name}", array(typecode, values)))
+
+    offset = ColumnarHeader.size + ColumnarEntry.size * len(columns)
+    directory = bytearray(ColumnarHeader.pack(ColumnarMagic, ColumnarVersion, script.Length.value, len(columns)))
+    blobs = []
+    for name, values in columns:
+        offset += -offset % 8
+        if sys.byteorder == "big":
+            values = array(values.typecode, values)
+            values.byteswap()
+        blob = values.tobytes()
+        directory += ColumnarEntry.pack(name.encode(), values.typecode.encode(), offset, len(values))
+        blobs.append((offset, blob))
+        offset += len(blob)
+
+    with open(path, "wb") as file:
+        file.write(directory)
+        for offset, blob in blobs:
+            file.write(bytes(offset - file.tell()))
+            file.write(blob)
+        written = file.tell()
+    if stats is not None:
+        stats.Record("render", "columnar", perf_counter() - start, 0, written, len(tables["Instructions"]))
+
+def LoadColumn(view, typecode, offset, count):
+    if sys.byteorder == "big":
+        values = array(typecode)
+        values.frombytes(view[offset:offset + count * values.itemsize])
+        values.byteswap()
+        return values
+    return view[offset:offset + count * array(typecode).itemsize].cast(typecode)
+
+def load_columnar(path):
+    """
+    Map a file written by save_columnar. Columns are views into the mapping
+    and strings are decoded on access, so loading reads almost nothing.
+    """
+    with open(path, "rb") as file:
+        view = memoryview(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+    magic, version, length, count = ColumnarHeader.unpack_from(view)
+    if magic != ColumnarMagic:
+        raise ValueError(f"Wrong columnar format, got: {magic}, expected: {ColumnarMagic}.")
+    if version != ColumnarVersion:
+        raise ValueError(f"Unsupported columnar version {version}, expected {ColumnarVersion}.")
+
+    columns = {}
+    for i in range(count):
+        name, typecode, offset, size = ColumnarEntry.unpack_from(view, ColumnarHeader.size + i * ColumnarEntry.size)
+        columns[name.rstrip(b"\x00").decode()] = LoadColumn(view, typecode.decode(), offset, size)
+
+    def GetColumns(tableName):
+        values = []
+        for name, typecode in ColumnarLayout[tableName]:
+            if typecode == "*":
+                values.append(StringPool(columns[f"{tableName}.{name}.o"], columns[f"{tableName}.{name}.s"]))
+            else:
+                values.append(columns[f"{tableName}.{name}"])
+        return values
+
+    def Restore(cls, tableName):
+        # Function and jump tables are normally built from rows; fill their
+        # slots directly instead.
+        table = cls.__new__(cls)
+        for (name, _), values in zip(ColumnarLayout[tableName], GetColumns(tableName)):
+            setattr(table, name, values)
+        table.Count = len(table.Name)
+        return table
+
+    return ScriptFile((
+        Restore(FunctionColumns, "Functions"),
+        Restore(JumpColumns, "Jumps"),
+        InstructionColumns(GetColumns("Instructions")),
+        ArgumentColumns(GetColumns("Arguments")),
+        PointerLength(length),
+    ))
@@ -1,6 +1,8 @@
+from .header import *
 from .rle import *
 from .lz10 import *
 from .lzss import *
 from .huffman import *
 from .compressor import *
 from .zlib_level5 import *
+from .stream import *
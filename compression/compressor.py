@@ -1,24 +1,95 @@
-from compression import *
+from concurrent.futures import ProcessPoolExecutor
+
+from compression import huffman, lz10, rle, zlib_level5
+from compression.header import *
+from compression.lzss import lzss_decompress, lzss_decompress_into
+
+class Codec:
+    """
+    How one Level5 method is decoded and encoded. Every function takes and
+    returns whole data, header included; `decompress_into` writes into a
+    caller's buffer and returns the number of bytes written.
+    """
+
+    def __init__(self, method, decompress, compress, decompress_into=None):
+        self.method = method
+        self.decompress = decompress
+        self.compress = compress
+        self.decompress_into = decompress_into
+
+def stored_decompress(data):
+    _, size = read_header(data, CompressionType.null)
+    return bytes(data[HEADER_SIZE:HEADER_SIZE + size])
+
+def stored_decompress_into(data, output):
+    _, size = read_header(data, CompressionType.null)
+    stored = data[HEADER_SIZE:HEADER_SIZE + size]
+    output[:len(stored)] = stored
+    return len(stored)
+
+def stored_compress(data):
+    return write_header(CompressionType.null, len(data)) + bytes(data)
+
+CODECS = {}
+
+def register_codec(codec):
+    CODECS[CompressionType(codec.method)] = codec
+
+def get_codec(method):
+    try:
+        return CODECS[CompressionType(method)]
+    except (KeyError, ValueError):
+        raise UnknownMethodError(f"Unknown Level5 compression method {method}") from None
+
+register_codec(Codec(CompressionType.null, stored_decompress, stored_compress, stored_decompress_into))
+register_codec(Codec(CompressionType.Level5_Lz10, lzss_decompress, lz10.compress, lzss_decompress_into))
+register_codec(Codec(CompressionType.Level5_Huffman4Bit, lambda data: huffman.decompress(data, 4), lambda data: huffman.compress(data, 4),
+                     lambda data, output: huffman.decompress_into(data, output, 4)))
+register_codec(Codec(CompressionType.Level5_Huffman8Bit, lambda data: huffman.decompress(data, 8), lambda data: huffman.compress(data, 8),
+                     lambda data, output: huffman.decompress_into(data, output, 8)))
+register_codec(Codec(CompressionType.Level5_Rle, rle.decompress, rle.compress, rle.decompress_into))
+register_codec(Codec(CompressionType.ZLib, zlib_level5.zlib_decompress, zlib_level5.zlib_compress, zlib_level5.zlib_decompress_into))
+
+# Level5 compression methods, as stored in the low 3 bits of the header.
+METHODS = tuple(method.value for method in CODECS)
 
 def decompress(data):
-    size_method_buffer = data[:4]
-    size = (size_method_buffer[0] >> 3) | (size_method_buffer[1] << 5) | \
-           (size_method_buffer[2] << 13) | (size_method_buffer[3] << 21)
-    
-    method = size_method_buffer[0] & 0x7
-    
-    if method == 0:
-        return data[4:]
-    elif method == 1:
-        return lzss_decompress(data)
-    elif method == 2:
-        return huffman.decompress(data, 4)
-    elif method == 3:
-        return huffman.decompress(data, 8)
-    elif method == 4:
-        return rle.decompress(data)
-    elif method == 5:        
-        return zlib_level5.zlib_decompress(data)
+    method, size = read_header(data)
+    result = get_codec(method).decompress(data)
+    if len(result) < size:
+        raise TruncatedDataError(f"Level5 {method.name} data ended early")
+    return result
+
+def decompress_into(data, buffer):
+    """
+    Decompress into a preallocated bytearray or writable memoryview, which
+    must hold at least the size in the header; returns that size. Codecs
+    without a native path decode to bytes and are copied in.
+    """
+    method, size = read_header(data)
+    if len(buffer) < size:
+        raise CompressionError(f"Buffer of {len(buffer)} bytes is too small for {size}")
+    codec = get_codec(method)
+    if codec.decompress_into is not None:
+        written = codec.decompress_into(data, buffer)
     else:
-        return None      
-    
\ No newline at end of file
+        result = codec.decompress(data)
+        written = min(len(result), size)
+        buffer[:written] = result[:written]
+    if written < size:
+        raise TruncatedDataError(f"Level5 {method.name} data ended early")
+    return size
+
+def compress(data, method):
+    return get_codec(method).compress(data)
+
+def compress_best(data, methods=METHODS, executor=None):
+    # Every method runs in its own worker process; pass an executor to
+    # reuse one pool across many tables. Ties go to the earlier method.
+    data = bytes(data)
+    if executor is None:
+        with ProcessPoolExecutor(max_workers=len(methods)) as executor:
+            return compress_best(data, methods, executor)
+
+    futures = [executor.submit(compress, data, method) for method in methods]
+    return min((future.result() for future in futures), key=len)
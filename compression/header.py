@@ -0,0 +1,49 @@
+import struct
+from enum import Enum
+
+class CompressionType(Enum):
+    null = 0
+    Level5_Lz10 = 1
+    Level5_Huffman4Bit = 2
+    Level5_Huffman8Bit = 3
+    Level5_Rle = 4
+    ZLib = 5
+
+class CompressionError(ValueError):
+    pass
+
+class UnknownMethodError(CompressionError):
+    pass
+
+class MethodMismatchError(CompressionError):
+    pass
+
+class TruncatedDataError(CompressionError):
+    pass
+
+class CorruptDataError(CompressionError):
+    pass
+
+# The Level5 header: the decompressed size in the upper 29 bits of a
+# little-endian u32 and the method in the low 3.
+HEADER = struct.Struct("<I")
+HEADER_SIZE = HEADER.size
+MAX_SIZE = (1 << 29) - 1
+
+def read_header(data, expected=None):
+    """Return (CompressionType, decompressed size) from the first 4 bytes of `data`."""
+    if len(data) < HEADER_SIZE:
+        raise TruncatedDataError("Level5 data is shorter than its header")
+    value = HEADER.unpack_from(data)[0]
+    try:
+        method = CompressionType(value & 0x7)
+    except ValueError:
+        raise UnknownMethodError(f"Unknown Level5 compression method {value & 0x7}") from None
+    if expected is not None and method != CompressionType(expected):
+        raise MethodMismatchError(f"Level5 method {method.name}, expected {CompressionType(expected).name}")
+    return method, value >> 3
+
+def write_header(method, size):
+    if size > MAX_SIZE:
+        raise CompressionError(f"{size} bytes do not fit in a Level5 header")
+    return HEADER.pack(size << 3 | CompressionType(method).value)
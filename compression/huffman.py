@@ -1,70 +1,330 @@
-import io
-import struct
+import heapq
+import sys
+from array import array
+
+from compression.header import CompressionType, TruncatedDataError, read_header, write_header
 
 class NibbleOrder:
     LowNibbleFirst = 0
     HighNibbleFirst = 1
 
+# Number of input bits consumed per lookup step of the table-driven decoder.
+TABLE_BITS = 8
+HALF_BITS = TABLE_BITS // 2
+
+SHIFT_LEFT_4 = bytes((i << 4) & 0xFF for i in range(256))
+LOW_NIBBLE = bytes(i & 0xF for i in range(256))
+HIGH_NIBBLE = bytes(i >> 4 for i in range(256))
+
+class HuffmanTable:
+    """
+    Lookup tables for a Level5 Huffman tree.
+
+    A decoder state is an internal node of the tree, identified by its node
+    byte and the position of its child pair, exactly as the bitwise decoder
+    tracks them with `pos` and `next_val`. For every state that is reached,
+    a row maps each TABLE_BITS-bit input chunk to the symbols it completes
+    and the state it ends in. Rows are built once a state has been
+    decoded from `threshold` times; until then, bytes are walked bit by bit.
+    """
+
+    def __init__(self, tree_root, tree_buffer):
+        self.tree_root = tree_root
+        self.tree_buffer = tree_buffer
+        self.states = {}
+        self.keys = []
+        self.rows = []
+        self.hits = []
+        self.halves = {}
+        # Building rows costs more the larger the tree, as more states get
+        # rows of their own: Huffman8 trees have up to 255 node pairs, and
+        # small tables would never win back rows they barely use.
+        self.threshold = len(tree_buffer) // 4
+        self.root = self.state(tree_root, 0)
+
+    def state(self, pos, next_val):
+        key = (pos, next_val)
+        state = self.states.get(key)
+        if state is None:
+            state = self.states[key] = len(self.rows)
+            self.keys.append(key)
+            self.rows.append(None)
+            self.hits.append(0)
+        return state
+
+    def walk(self, state, bits):
+        # Follow `bits` input bits from `state`, one tree level per bit.
+        tree_root = self.tree_root
+        tree_buffer = self.tree_buffer
+        entries = [None] * (1 << bits)
+
+        def step(pos, next_val, depth, prefix, symbols):
+            if depth == bits:
+                entries[prefix] = (bytes(symbols), self.state(pos, next_val))
+                return
+
+            next_val += ((pos & 0x3F) << 1) + 2
+            for bit, direction in ((0, 2), (1, 1)):
+                child = tree_buffer[next_val - direction]
+                if (pos >> 5 >> direction) % 2 != 0:
+                    step(tree_root, 0, depth + 1, prefix << 1 | bit, symbols + [child])
+                else:
+                    step(child, next_val, depth + 1, prefix << 1 | bit, symbols)
+
+        pos, next_val = self.keys[state]
+        step(pos, next_val, 0, 0, [])
+        return entries
+
+    def half_row(self, state):
+        half = self.halves.get(state)
+        if half is None:
+            half = self.halves[state] = self.walk(state, HALF_BITS)
+        return half
+
+    def walk_byte(self, state, byte):
+        # The bitwise decoder, for one byte of input.
+        tree_root = self.tree_root
+        tree_buffer = self.tree_buffer
+        pos, next_val = self.keys[state]
+        symbols = []
+        for shift in range(TABLE_BITS - 1, -1, -1):
+            next_val += ((pos & 0x3F) << 1) + 2
+            direction = 1 if byte >> shift & 1 else 2
+            child = tree_buffer[next_val - direction]
+            if (pos >> 5 >> direction) % 2 != 0:
+                symbols.append(child)
+                pos, next_val = tree_root, 0
+            else:
+                pos = child
+        return bytes(symbols), self.state(pos, next_val)
+
+    def build_row(self, state):
+        # A full row is two half-width lookups chained together, which is
+        # much cheaper to build than walking TABLE_BITS levels per entry.
+        row = []
+        for high_symbols, middle in self.half_row(state):
+            for low_symbols, end in self.half_row(middle):
+                row.append((high_symbols + low_symbols, end))
+        self.rows[state] = row
+        return row
+
+    def run(self, state, code):
+        """Decode `code` from `state`; return the symbols and the end state."""
+        rows = self.rows
+        hits = self.hits
+        threshold = self.threshold
+        chunks = []
+        append = chunks.append
+        for byte in code:
+            row = rows[state]
+            if row is None:
+                hits[state] += 1
+                if hits[state] < threshold:
+                    symbols, state = self.walk_byte(state, byte)
+                    append(symbols)
+                    continue
+                row = self.build_row(state)
+            symbols, state = row[byte]
+            append(symbols)
+        return b"".join(chunks), state
+
+    def decode(self, code, count):
+        result, _ = self.run(self.root, code)
+        if len(result) < count:
+            raise TruncatedDataError("Level5 Huffman data ended early")
+        return result[:count]
+
+def read_code(data):
+    # The bit stream is a sequence of little-endian 32-bit words read from
+    # the most significant bit down; byte-swapping every word turns it into
+    # a plain MSB-first byte stream.
+    code = array("I")
+    code.frombytes(data[:len(data) - len(data) % 4])
+    if sys.byteorder == "little":
+        code.byteswap()
+    return code.tobytes()
+
+def write_code(bits):
+    bits += "0" * (-len(bits) % 32)
+    code = array("I")
+    code.frombytes(int(bits, 2).to_bytes(len(bits) // 8, "big") if bits else b"")
+    if sys.byteorder == "little":
+        code.byteswap()
+    return code.tobytes()
+
+def combine_nibbles(symbols, nibble_order=NibbleOrder.LowNibbleFirst):
+    low, high = symbols[0::2], symbols[1::2]
+    if nibble_order == NibbleOrder.LowNibbleFirst:
+        high = high.translate(SHIFT_LEFT_4)
+    else:
+        low = low.translate(SHIFT_LEFT_4)
+    combined = int.from_bytes(low, "little") | int.from_bytes(high, "little")
+    return combined.to_bytes(len(low), "little")
+
+def split_nibbles(data, nibble_order=NibbleOrder.LowNibbleFirst):
+    symbols = bytearray(len(data) * 2)
+    if nibble_order == NibbleOrder.LowNibbleFirst:
+        symbols[0::2], symbols[1::2] = data.translate(LOW_NIBBLE), data.translate(HIGH_NIBBLE)
+    else:
+        symbols[0::2], symbols[1::2] = data.translate(HIGH_NIBBLE), data.translate(LOW_NIBBLE)
+    return bytes(symbols)
+
+def read_stream(data, bit_depth):
+    """Return the decompressed size, the HuffmanTable and the code bytes of `data`."""
+    data = memoryview(data)
+    huffman_mode = CompressionType.Level5_Huffman4Bit if bit_depth == 4 else CompressionType.Level5_Huffman8Bit
+    _, decompressed_size = read_header(data, huffman_mode)
+    if decompressed_size == 0:
+        return 0, None, b""
+    if len(data) < 6:
+        raise TruncatedDataError("Level5 Huffman data ended early")
+
+    tree_size = data[4]
+    tree_root = data[5]
+    tree_buffer = bytes(data[6:6 + tree_size * 2])
+    return decompressed_size, HuffmanTable(tree_root, tree_buffer), read_code(data[6 + tree_size * 2:])
+
 def decompress(data, bit_depth):
-    def decode_headerless(input_stream, output_stream, decompressed_size):
-        nibble_order = NibbleOrder.LowNibbleFirst 
-        result = bytearray(decompressed_size * 8 // bit_depth)
-
-        with io.BytesIO(input_stream.read()) as br:
-            tree_size = br.read(1)[0]
-            tree_root = br.read(1)[0]
-            tree_buffer = br.read(tree_size * 2)
-
-            i = 0
-            code = 0
-            next_val = 0
-            pos = tree_root
-            result_pos = 0
-
-            while result_pos < len(result):
-                if i % 32 == 0:
-                    code = struct.unpack("I", br.read(4))[0]
-
-                next_val += ((pos & 0x3F) << 1) + 2
-                direction = 2 if (code >> (31 - i) % 32) % 2 == 0 else 1
-                leaf = (pos >> 5 >> direction) % 2 != 0
-
-                pos = tree_buffer[next_val - direction]
-
-                if leaf:
-                    result[result_pos] = pos
-                    result_pos += 1
-                    pos = tree_root
-                    next_val = 0
-                    
-                i += 1
-
-        if bit_depth == 8:
-            output_stream.write(result)
-        else:
-            combined_data = [
-                (result[2 * j] | (result[2 * j + 1] << 4))
-                if nibble_order == NibbleOrder.LowNibbleFirst
-                else ((result[2 * j] << 4) | result[2 * j + 1])
-                for j in range(decompressed_size)
-            ]
-
-            output_stream.write(bytes(combined_data))
-
-    with io.BytesIO(data) as input_stream, io.BytesIO() as output_stream:
-        compression_header = input_stream.read(4)
-
-        huffman_mode = 2 if bit_depth == 4 else 3
-        if (compression_header[0] & 0x7) != huffman_mode:
-            raise ValueError(f"Level5 Huffman{bit_depth}")
-
-        decompressed_size = (
-            (compression_header[0] >> 3)
-            | (compression_header[1] << 5)
-            | (compression_header[2] << 13)
-            | (compression_header[3] << 21)
-        )
-        
-        decode_headerless(input_stream, output_stream, decompressed_size)
-
-        return output_stream.getvalue()
+    decompressed_size, table, code = read_stream(data, bit_depth)
+    if decompressed_size == 0:
+        return b""
+    result = table.decode(code, decompressed_size * 8 // bit_depth)
+
+    if bit_depth == 8:
+        return result
+    return combine_nibbles(result)
+
+# Code bytes decoded per step of decompress_into, which bounds the symbols
+# held besides the caller's buffer.
+CHUNK_SIZE = 0x8000
+
+def decompress_into(data, output, bit_depth):
+    """
+    Decode into the first `size` bytes of a preallocated bytearray or
+    memoryview; returns how many were written, less than `size` if the
+    data ended early.
+    """
+    size, table, code = read_stream(data, bit_depth)
+    if size == 0:
+        return 0
+    state = table.root
+    output = memoryview(output)
+    pending = b""
+    op = 0
+    for i in range(0, len(code), CHUNK_SIZE):
+        symbols, state = table.run(state, code[i:i + CHUNK_SIZE])
+        if bit_depth == 4:
+            # A chunk can end between the two nibbles of a byte.
+            symbols = pending + symbols
+            even = len(symbols) & ~1
+            pending = symbols[even:]
+            symbols = combine_nibbles(symbols[:even])
+        length = min(len(symbols), size - op)
+        output[op:op + length] = memoryview(symbols)[:length]
+        op += length
+        if op == size:
+            break
+    return op
+
+def build_tree(symbols):
+    frequencies = [0] * 256
+    for symbol in set(symbols):
+        frequencies[symbol] = symbols.count(symbol)
+
+    # Leaves are (symbol,), internal nodes are (left, right).
+    heap = [(frequency, symbol, (symbol,)) for symbol, frequency in enumerate(frequencies) if frequency]
+    while len(heap) < 2:
+        unused = next(symbol for symbol in range(256) if not frequencies[symbol] and
+                      all(symbol != node[1] for node in heap))
+        heap.append((0, unused, (unused,)))
+    heapq.heapify(heap)
+
+    order = 256
+    while len(heap) > 1:
+        left = heapq.heappop(heap)
+        right = heapq.heappop(heap)
+        heapq.heappush(heap, (left[0] + right[0], order, (left[2], right[2])))
+        order += 1
+    return heap[0][2]
+
+def layout_tree(root):
+    """
+    Order the child pairs of a tree so every node can reach its pair with
+    the 6-bit offset of the Level5 tree format.
+
+    A pair has to be placed at most 64 pairs after the pair holding its
+    parent. Pairs are placed depth-first, which keeps few nodes waiting,
+    unless that would leave the waiting nodes unable to meet their
+    deadlines, in which case the most urgent one is placed instead.
+    """
+    pairs = []
+    positions = {}
+    pending = [(63, root)]
+
+    def feasible(waiting, position):
+        for k, deadline in enumerate(sorted(deadline for deadline, _ in waiting)):
+            if deadline < position + k:
+                return False
+        return True
+
+    while pending:
+        position = len(pairs)
+        chosen = len(pending) - 1
+        deadline, node = pending[chosen]
+        children = [(position + 64, child) for child in node if len(child) == 2]
+        if not feasible(pending[:chosen] + children, position + 1):
+            chosen = min(range(len(pending)), key=lambda i: pending[i][0])
+            deadline, node = pending[chosen]
+            children = [(position + 64, child) for child in node if len(child) == 2]
+        if deadline < position:
+            raise ValueError("Huffman tree cannot be stored with 6-bit node offsets")
+
+        del pending[chosen]
+        positions[id(node)] = position
+        pairs.append(node)
+        pending.extend(children)
+
+    def node_byte(node, parent_position):
+        if len(node) == 1:
+            return node[0]
+        offset = positions[id(node)] - parent_position - 1
+        flags = (0x80 if len(node[0]) == 1 else 0) | (0x40 if len(node[1]) == 1 else 0)
+        return flags | offset
+
+    tree_buffer = bytearray()
+    for position, node in enumerate(pairs):
+        tree_buffer.append(node_byte(node[0], position))
+        tree_buffer.append(node_byte(node[1], position))
+    return node_byte(root, -1), bytes(tree_buffer)
+
+def build_codes(node, prefix="", codes=None):
+    if codes is None:
+        codes = {}
+    if len(node) == 1:
+        codes[node[0]] = prefix
+    else:
+        build_codes(node[0], prefix + "0", codes)
+        build_codes(node[1], prefix + "1", codes)
+    return codes
+
+def compress(data, bit_depth):
+    data = bytes(data)
+    symbols = data if bit_depth == 8 else split_nibbles(data)
+
+    tree = build_tree(symbols)
+    tree_root, tree_buffer = layout_tree(tree)
+    # Keep the bit stream 4-byte aligned: header, size, root and pairs.
+    if len(tree_buffer) % 4 == 0:
+        tree_buffer += b"\x00\x00"
+
+    codes = [""] * 256
+    for symbol, code in build_codes(tree).items():
+        codes[symbol] = code
+
+    huffman_mode = CompressionType.Level5_Huffman4Bit if bit_depth == 4 else CompressionType.Level5_Huffman8Bit
+    return (
+        write_header(huffman_mode, len(data))
+        + bytes((len(tree_buffer) // 2, tree_root))
+        + tree_buffer
+        + write_code("".join(map(codes.__getitem__, symbols)))
+    )
@@ -1,97 +1,138 @@
-import struct
-
-def compress(data: bytes) -> bytes:
-    def compressionSearch(pos):
-        """
-        Find the longest match in `data` (nonlocal) at or after `pos`.
-        This function has been rewritten in place of NSMBe's,
-        to optimize its performance in Python.
-        (A straight port of NSMBe's algorithm caused some files to take
-        over 40 seconds to compress. With this version, all files I've
-        tested take less than one second, and the compressed files
-        match the old algorithm's output byte for byte.)
-        """
-
-        start = max(0, pos - 0x1000)
-
-        # Strategy: do a binary search of potential match sizes, to
-        # find the longest match that exists in the data.
-
-        lower = 0
-        upper = min(18, len(data) - pos)
-
-        recordMatchPos = recordMatchLen = 0
-        while lower <= upper:
-            # Attempt to find a match at the middle length
-            matchLen = (lower + upper) // 2
-            match = data[pos : pos + matchLen]
-            if False:
-                matchPos = data.rfind(match, start, pos)
-            else:
-                matchPos = data.find(match, start, pos)
-
-            if matchPos == -1:
-                # No such match -- any matches will be smaller than this
-                upper = matchLen - 1
-            else:
-                # Match found!
-                if matchLen > recordMatchLen:
-                    recordMatchPos, recordMatchLen = matchPos, matchLen
-                lower = matchLen + 1
-
-        return recordMatchPos, recordMatchLen
-    
+from compression.header import CompressionType, write_header
+
+class Lz10Level:
+    Fast = 0
+    Lazy = 1
+    Optimal = 2
+
+WINDOW_SIZE = 0x1000
+MIN_MATCH = 3
+MAX_MATCH = 18
+
+class MatchFinder:
+    """
+    Longest-match search with bytes.rfind: the nearest earlier occurrence
+    of the first MIN_MATCH bytes is extended as far as it goes, then the
+    search continues before it for one byte more than the best so far.
+    Each step is a C-speed scan of the window, and at most MAX_MATCH -
+    MIN_MATCH of them are needed, so every position gets its longest
+    match without walking candidates one by one in Python.
+    """
+
+    def __init__(self, data):
+        self.data = data
+
+    def find(self, pos):
+        """Return (length, distance) of the longest match at `pos`, or (0, 0)."""
+        data = self.data
+        limit = min(MAX_MATCH, len(data) - pos)
+        if limit < MIN_MATCH:
+            return 0, 0
+
+        rfind = data.rfind
+        floor = max(pos - WINDOW_SIZE, 0)
+        target = data[pos:pos + limit]
+        best_length = 0
+        best_distance = 0
+        length = MIN_MATCH
+        # Matches may run past `pos`, but must start before it.
+        end = pos - 1 + length
+        while True:
+            candidate = rfind(target[:length], floor, end)
+            if candidate < 0:
+                break
+            while length < limit and data[candidate + length] == target[length]:
+                length += 1
+            best_length, best_distance = length, pos - candidate
+            if length == limit:
+                break
+            # Nearer positions did not match `length` bytes, so a longer
+            # match can only start before this candidate.
+            length += 1
+            end = candidate - 1 + length
+
+        return best_length, best_distance
+
+def parse_greedy(data, finder, lazy):
+    tokens = []
+    pos = 0
+    size = len(data)
+    pending = None
+    while pos < size:
+        length, distance = pending or finder.find(pos)
+        pending = None
+        if length >= MIN_MATCH and lazy and pos + 1 < size:
+            # Defer by one literal when the next position has a longer match.
+            following = finder.find(pos + 1)
+            if following[0] > length:
+                tokens.append(data[pos])
+                pos += 1
+                pending = following
+                continue
+        if length >= MIN_MATCH:
+            tokens.append((length, distance))
+            pos += length
+        else:
+            tokens.append(data[pos])
+            pos += 1
+    return tokens
+
+def parse_optimal(data, finder):
+    # Shortest path over positions, in bits: a literal costs 9 and a match
+    # costs 17, counting its flag bit. Any length up to the longest match
+    # found at a position can be used with the same distance.
+    size = len(data)
+    matches = [finder.find(pos) for pos in range(size)]
+
+    cost = [0] * (size + 1)
+    choice = [1] * (size + 1)
+    for pos in range(size - 1, -1, -1):
+        best = cost[pos + 1] + 9
+        best_length = 1
+        length = matches[pos][0]
+        while length >= MIN_MATCH:
+            candidate = cost[pos + length] + 17
+            if candidate < best:
+                best, best_length = candidate, length
+            length -= 1
+        cost[pos] = best
+        choice[pos] = best_length
+
+    tokens = []
+    pos = 0
+    while pos < size:
+        length = choice[pos]
+        if length >= MIN_MATCH:
+            tokens.append((length, matches[pos][1]))
+        else:
+            tokens.append(data[pos])
+        pos += length
+    return tokens
+
+def write_tokens(tokens):
     result = bytearray()
-
-    current = 0 # Index of current byte to compress
-
-    ignorableDataAmount = 0
-    ignorableCompressedAmount = 0
-
-    bestSavingsSoFar = 0
-    
-    while current < len(data):
-        blockFlags = 0
-
-        # We'll go back and fill in blockFlags at the end of the loop.
-        blockFlagsOffset = len(result)
+    for block in range(0, len(tokens), 8):
+        flags_offset = len(result)
         result.append(0)
-        ignorableCompressedAmount += 1
-
-        for i in range(8):
-
-            # Not sure if this is needed. The DS probably ignores this data.
-            if current >= len(data):
-                if True:
-                    result.append(0)
-                continue
-
-            searchPos, searchLen = compressionSearch(current)
-            searchDisp = current - searchPos - 1
-
-            if searchLen > 2:
-                # We found a big match; let's write a compressed block
-                blockFlags |= 1 << (7 - i)
-
-                result.append((((searchLen - 3) & 0xF) << 4) | ((searchDisp >> 8) & 0xF))
-                result.append(searchDisp & 0xFF)
-                current += searchLen
-
-                ignorableDataAmount += searchLen
-                ignorableCompressedAmount += 2
-
+        flags = 0
+        for i, token in enumerate(tokens[block:block + 8]):
+            if isinstance(token, int):
+                result.append(token)
             else:
-                result.append(data[current])
-                current += 1
-                ignorableDataAmount += 1
-                ignorableCompressedAmount += 1
-
-            savingsNow = current - len(result)
-            if savingsNow > bestSavingsSoFar:
-                ignorableDataAmount = 0
-                ignorableCompressedAmount = 0
-                bestSavingsSoFar = savingsNow
-
-        result[blockFlagsOffset] = blockFlags
-      
-    return struct.pack('<I', len(data) << 3 | 0x1) + bytes(result)
+                length, distance = token
+                disp = distance - 1
+                flags |= 1 << (7 - i)
+                result.append(((length - MIN_MATCH) << 4) | (disp >> 8))
+                result.append(disp & 0xFF)
+        result[flags_offset] = flags
+    return bytes(result)
+
+def compress(data: bytes, level=Lz10Level.Lazy) -> bytes:
+    data = bytes(data)
+    finder = MatchFinder(data)
+    if level == Lz10Level.Optimal:
+        tokens = parse_optimal(data, finder)
+    else:
+        tokens = parse_greedy(data, finder, lazy=level == Lz10Level.Lazy)
+
+    return write_header(CompressionType.Level5_Lz10, len(data)) + write_tokens(tokens)
@@ -1,76 +1,64 @@
-import struct
+from compression import lz10
+from compression.header import CompressionType, CorruptDataError, HEADER_SIZE, read_header
 
 def lzss_decompress(data):
-    output = []
-    p = 4
+    _, size = read_header(data, CompressionType.Level5_Lz10)
+    output = bytearray(size)
+    op = lzss_decompress_into(data, output)
+    return bytes(output) if op == size else bytes(output[:op])
+
+def lzss_decompress_into(data, output):
+    """
+    Decode into the first `size` bytes of a preallocated bytearray or
+    memoryview; returns how many were written, less than `size` if the
+    data ended early.
+    """
+    _, size = read_header(data, CompressionType.Level5_Lz10)
+    end = len(data)
+    p = HEADER_SIZE
     op = 0
 
-    mask = 0
-    flag = 0
+    while op < size and p < end:
+        flag = data[p]
+        p += 1
 
-    while p < len(data):
-        if mask == 0:
-            flag = data[p]
-            p += 1
-            mask = 0x80
+        if flag == 0 and p + 8 <= end and op + 8 <= size:
+            # Eight literals in a row.
+            output[op:op + 8] = data[p:p + 8]
+            p += 8
+            op += 8
+            continue
 
-        if (flag & mask) == 0:
-            if p + 1 > len(data):
-                break
-            output.append(data[p])
-            p += 1
-            op += 1
-        else:
-            if p + 2 > len(data):
+        for mask in (0x80, 0x40, 0x20, 0x10, 0x08, 0x04, 0x02, 0x01):
+            if op >= size:
                 break
-            dat = (data[p] << 8) | data[p + 1]
-            p += 2
-            pos = (dat & 0x0FFF) + 1
-            length = (dat >> 12) + 3
 
-            for i in range(length):
-                if op - pos >= 0:
-                    output.append(output[op - pos] if op - pos < len(output) else 0)
-                    op += 1
+            if (flag & mask) == 0:
+                if p >= end:
+                    return op
+                output[op] = data[p]
+                p += 1
+                op += 1
+            else:
+                if p + 2 > end:
+                    return op
+                dat = (data[p] << 8) | data[p + 1]
+                p += 2
+                distance = (dat & 0x0FFF) + 1
+                length = min((dat >> 12) + 3, size - op)
 
-        mask >>= 1
-        
-    return bytes(output)
+                start = op - distance
+                if start < 0:
+                    raise CorruptDataError("Level5 Lz10 back-reference before the start of the output")
+                if distance >= length:
+                    output[op:op + length] = output[start:start + length]
+                else:
+                    # Overlapping copy: the source repeats every `distance` bytes.
+                    pattern = bytes(output[start:op])
+                    output[op:op + length] = (pattern * (length // distance + 1))[:length]
+                op += length
 
-def lzss_compress(data):
-    window = []
-    output = []
-    flags = 0
-    flag_index = 0
+    return op
 
-    for i in range(len(data)):
-        search_index = max(0, len(window) - 4096)
-        offset = 0
-        length = 0
-        for j in range(search_index, len(window)):
-            if window[j:j + i - search_index] == data[search_index:i]:
-                offset = len(window) - j
-                length = i - search_index
-                break
-        if length >= 3:
-            length_dist = (length - 3) * 4096 + (offset - 1)
-            output.append(length_dist & 0xff)
-            output.append((length_dist >> 8) & 0xff)
-            flags |= (1 << (7 - flag_index))
-            flag_index += 1
-        else:
-            output.append(data[i])
-            flags |= (0 << (7 - flag_index))
-            flag_index += 1
-        if flag_index == 8:
-            output.append(flags)
-            flag_index = 0
-            flags = 0
-        window.append(data[i])
-    if flag_index > 0:
-        while flag_index < 8:
-            flags |= (0 << (7 - flag_index))
-            flag_index += 1
-        output.append(flags)
-      
-    return struct.pack('<I', len(data) << 3 | 0x1) + bytes(output)
+def lzss_compress(data):
+    return lz10.compress(data)
@@ -1,24 +1,97 @@
-import io
+import re
+
+from compression.header import CompressionType, TruncatedDataError, read_header, write_header
+
+# A run token repeated back to back, as long runs of one byte encode.
+RUN_TOKENS = re.compile(rb"([\x80-\xff].)\1*", re.S)
+
+# Tokens are decoded in stretches of this many input bytes, so
+# decompress_into holds one stretch's output besides the caller's buffer.
+CHUNK_SIZE = 0x2000
+
+def expand(data):
+    """Yield the decoded bytes of `data`, header included, as bytearray chunks."""
+    # Appending measured faster than slice assignment into a preallocated
+    # buffer for the few-byte tokens of typical tables; the win comes from
+    # expanding a whole stretch of identical run tokens at once.
+    match = RUN_TOKENS.match
+    end = len(data)
+    p = 4
+    while p < end:
+        stop = min(p + CHUNK_SIZE, end)
+        output = bytearray()
+        while p < stop:
+            flag = data[p]
+            if flag < 0x80:
+                q = p + flag + 2
+                output += data[p + 1:q]
+                p = q
+            else:
+                token = data[p:p + 2]
+                q = p + 2
+                if data.startswith(token, q):
+                    q = match(data, p).end()
+                output += token[1:] * ((q - p) // 2 * (flag - 0x7D))
+                p = q
+        yield output
 
 def decompress(input_bytes):
-    input_stream = io.BytesIO(input_bytes)
-    compression_header = input_stream.read(4)
-    
-    if compression_header[0] & 0x7 != 0x4:
-        raise Exception("Not Level5 Rle")
-
-    decompressed_size = (compression_header[0] >> 3) | (compression_header[1] << 5) | \
-                        (compression_header[2] << 13) | (compression_header[3] << 21)
-
-    output_stream = bytearray()
-    while len(output_stream) < decompressed_size:
-        flag = input_stream.read(1)[0]
-        if flag & 0x80:
-            repetitions = (flag & 0x7F) + 3
-            output_stream.extend(bytes([input_stream.read(1)[0]]) * repetitions)
-        else:
-            length = flag + 1
-            uncompressed_data = input_stream.read(length)
-            output_stream.extend(uncompressed_data)
-                
+    data = bytes(input_bytes)
+    _, decompressed_size = read_header(data, CompressionType.Level5_Rle)
+
+    output = b"".join(expand(data))
+    if len(output) < decompressed_size:
+        raise TruncatedDataError("Level5 Rle data ended early")
+    return output[:decompressed_size]
+
+def decompress_into(input_bytes, output):
+    """
+    Decode into the first `size` bytes of a preallocated bytearray or
+    memoryview; returns how many were written, less than `size` if the
+    data ended early.
+    """
+    data = bytes(input_bytes)
+    _, size = read_header(data, CompressionType.Level5_Rle)
+
+    # Slice assignment into a bytearray copies the source first; through a
+    # memoryview it does not.
+    output = memoryview(output)
+    op = 0
+    for chunk in expand(data):
+        length = min(len(chunk), size - op)
+        output[op:op + length] = memoryview(chunk)[:length]
+        op += length
+        if op == size:
+            break
+    return op
+
+# Three or more copies of the same byte.
+RUN = re.compile(rb"(.)\1{2,}", re.S)
+
+def compress(input_bytes):
+    data = bytes(input_bytes)
+    output_stream = bytearray(write_header(CompressionType.Level5_Rle, len(data)))
+
+    def write_literals(literals):
+        for i in range(0, len(literals), 0x80):
+            chunk = literals[i:i + 0x80]
+            output_stream.append(len(chunk) - 1)
+            output_stream.extend(chunk)
+
+    literal_start = 0
+    for run in RUN.finditer(data):
+        start, end = run.span()
+        write_literals(data[literal_start:start])
+
+        value = data[start]
+        length = end - start
+        while length >= 3:
+            repetitions = min(length, 0x7F + 3)
+            output_stream.append(0x80 | (repetitions - 3))
+            output_stream.append(value)
+            length -= repetitions
+        # A tail of one or two bytes is cheaper as part of the next literals.
+        literal_start = end - length
+    write_literals(data[literal_start:])
+
     return bytes(output_stream)
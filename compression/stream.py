@@ -0,0 +1,241 @@
+import zlib
+
+from compression.header import *
+from compression.huffman import HuffmanTable, read_code, combine_nibbles
+from compression.lz10 import WINDOW_SIZE
+
+class StoredDecoder:
+    def decode(self, data):
+        return bytes(data)
+
+    def finish(self):
+        return b""
+
+class Lz10Decoder:
+    """
+    Level5 Lz10 as a state machine: the flag byte being consumed and the
+    bits left in it survive between chunks, and only the last WINDOW_SIZE
+    bytes of output are kept for back-references.
+    """
+
+    def __init__(self):
+        self.window = bytearray()
+        self.flag = 0
+        self.mask = 0
+        self.pending = b""
+
+    def decode(self, data):
+        data = self.pending + bytes(data)
+        window = self.window
+        start = len(window)
+        end = len(data)
+        flag, mask = self.flag, self.mask
+        p = 0
+        while True:
+            if mask == 0:
+                if p >= end:
+                    break
+                flag = data[p]
+                p += 1
+                mask = 0x80
+                if flag == 0 and p + 8 <= end:
+                    # Eight literals in a row.
+                    window += data[p:p + 8]
+                    p += 8
+                    mask = 0
+                    continue
+
+            if flag & mask:
+                if p + 2 > end:
+                    break
+                dat = (data[p] << 8) | data[p + 1]
+                p += 2
+                distance = (dat & 0x0FFF) + 1
+                length = (dat >> 12) + 3
+                source = len(window) - distance
+                if source < 0:
+                    raise CorruptDataError("Level5 Lz10 back-reference before the start of the output")
+                if distance >= length:
+                    window += window[source:source + length]
+                else:
+                    # Overlapping copy: the source repeats every `distance` bytes.
+                    window += (window[source:] * (length // distance + 1))[:length]
+            else:
+                if p >= end:
+                    break
+                window.append(data[p])
+                p += 1
+            mask >>= 1
+
+        self.flag, self.mask = flag, mask
+        self.pending = data[p:]
+        output = bytes(window[start:])
+        if len(window) > WINDOW_SIZE:
+            del window[:len(window) - WINDOW_SIZE]
+        return output
+
+    def finish(self):
+        return b""
+
+class HuffmanDecoder:
+    """
+    Level5 Huffman: buffers until the tree is complete, then decodes whole
+    32-bit code words, carrying the tree state (and for 4-bit data an odd
+    nibble) over to the next chunk.
+    """
+
+    def __init__(self, bit_depth):
+        self.bit_depth = bit_depth
+        self.table = None
+        self.state = None
+        self.pending = b""
+        self.nibble = b""
+
+    def decode(self, data):
+        data = self.pending + bytes(data)
+        if self.table is None:
+            if len(data) < 1 or len(data) < 2 + data[0] * 2:
+                self.pending = data
+                return b""
+            tree_size = data[0]
+            self.table = HuffmanTable(data[1], data[2:2 + tree_size * 2])
+            self.state = self.table.root
+            data = data[2 + tree_size * 2:]
+
+        usable = len(data) - len(data) % 4
+        symbols, self.state = self.table.run(self.state, read_code(data[:usable]))
+        self.pending = data[usable:]
+        if self.bit_depth == 8:
+            return symbols
+
+        symbols = self.nibble + symbols
+        even = len(symbols) - len(symbols) % 2
+        self.nibble = symbols[even:]
+        return combine_nibbles(symbols[:even])
+
+    def finish(self):
+        return b""
+
+class RleDecoder:
+    def __init__(self):
+        self.literals = 0
+        self.pending = b""
+
+    def decode(self, data):
+        data = self.pending + bytes(data)
+        output = bytearray()
+        end = len(data)
+        p = 0
+        while True:
+            if self.literals:
+                count = min(self.literals, end - p)
+                output += data[p:p + count]
+                p += count
+                self.literals -= count
+                if self.literals:
+                    break
+            if p >= end:
+                break
+            flag = data[p]
+            if flag & 0x80:
+                if p + 1 >= end:
+                    break
+                output += data[p + 1:p + 2] * ((flag & 0x7F) + 3)
+                p += 2
+            else:
+                self.literals = flag + 1
+                p += 1
+        self.pending = data[p:]
+        return bytes(output)
+
+    def finish(self):
+        return b""
+
+class ZLibDecoder:
+    def __init__(self):
+        self.decompressor = None
+
+    def decode(self, data):
+        if self.decompressor is None:
+            if not data:
+                return b""
+            if data[0] != 0x78:
+                raise CorruptDataError("Level5 ZLib data is not a zlib stream")
+            self.decompressor = zlib.decompressobj()
+        try:
+            return self.decompressor.decompress(data)
+        except zlib.error as e:
+            raise CorruptDataError(f"Level5 ZLib data is corrupt: {e}") from None
+
+    def finish(self):
+        return self.decompressor.flush() if self.decompressor else b""
+
+DECODERS = {
+    CompressionType.null: StoredDecoder,
+    CompressionType.Level5_Lz10: Lz10Decoder,
+    CompressionType.Level5_Huffman4Bit: lambda: HuffmanDecoder(4),
+    CompressionType.Level5_Huffman8Bit: lambda: HuffmanDecoder(8),
+    CompressionType.Level5_Rle: RleDecoder,
+    CompressionType.ZLib: ZLibDecoder,
+}
+
+class Decompressor:
+    """
+    Incremental Level5 decompression, like zlib.decompressobj: feed() takes
+    compressed chunks and returns the output they complete, and flush()
+    returns what is left and raises TruncatedDataError if the data ended
+    early. The method is read from the header; if `method` is given the
+    header must match it. Input past the end of the output is ignored.
+    """
+
+    def __init__(self, method=None):
+        self.method = method
+        self.size = None
+        self.produced = 0
+        self.eof = False
+        self.header = b""
+        self.decoder = None
+
+    def feed(self, chunk):
+        if self.eof:
+            return b""
+        if self.decoder is None:
+            self.header += bytes(chunk)
+            if len(self.header) < HEADER_SIZE:
+                return b""
+            chunk = self.header[HEADER_SIZE:]
+            self.method, self.size = read_header(self.header, self.method)
+            self.decoder = DECODERS[self.method]()
+            if self.size == 0:
+                self.eof = True
+                return b""
+        return self.take(self.decoder.decode(chunk))
+
+    def take(self, output):
+        if self.produced + len(output) >= self.size:
+            output = output[:self.size - self.produced]
+            self.eof = True
+        self.produced += len(output)
+        return output
+
+    def flush(self):
+        output = b""
+        if self.decoder is not None and not self.eof:
+            output = self.take(self.decoder.finish())
+        if not self.eof:
+            raise TruncatedDataError("Level5 data ended early")
+        return output
+
+def decompress_stream(file, chunk_size=0x10000):
+    """Yield the decompressed output of a binary file object chunk by chunk."""
+    decompressor = Decompressor()
+    while not decompressor.eof:
+        chunk = file.read(chunk_size)
+        if not chunk:
+            break
+        output = decompressor.feed(chunk)
+        if output:
+            yield output
+    output = decompressor.flush()
+    if output:
+        yield output
@@ -1,11 +1,44 @@
 import zlib
-import struct
+
+from compression.header import CompressionType, CorruptDataError, HEADER_SIZE, read_header, write_header
 
 def zlib_decompress(data):
-    if data[4] == 0x78:
-        return zlib.decompress(data[4:])
-    else:
-        return False
-        
+    read_header(data, CompressionType.ZLib)
+    if len(data) <= HEADER_SIZE or data[HEADER_SIZE] != 0x78:
+        raise CorruptDataError("Level5 ZLib data is not a zlib stream")
+    try:
+        return zlib.decompress(data[HEADER_SIZE:])
+    except zlib.error as e:
+        raise CorruptDataError(f"Level5 ZLib data is corrupt: {e}") from None
+
+# Output bytes inflated per step of zlib_decompress_into. zlib hands back
+# bytes, so this bounds what is held besides the caller's buffer.
+CHUNK_SIZE = 0x10000
+
+def zlib_decompress_into(data, output):
+    """
+    Inflate into the first `size` bytes of a preallocated bytearray or
+    memoryview; returns how many were written, less than `size` if the
+    data ended early.
+    """
+    _, size = read_header(data, CompressionType.ZLib)
+    if len(data) <= HEADER_SIZE or data[HEADER_SIZE] != 0x78:
+        raise CorruptDataError("Level5 ZLib data is not a zlib stream")
+    decompressor = zlib.decompressobj()
+    output = memoryview(output)
+    pending = data[HEADER_SIZE:]
+    op = 0
+    try:
+        while op < size and pending:
+            chunk = decompressor.decompress(pending, min(CHUNK_SIZE, size - op))
+            if not chunk:
+                break
+            output[op:op + len(chunk)] = chunk
+            op += len(chunk)
+            pending = decompressor.unconsumed_tail
+    except zlib.error as e:
+        raise CorruptDataError(f"Level5 ZLib data is corrupt: {e}") from None
+    return op
+
 def zlib_compress(data):
-    return struct.pack('<I', len(data) << 3 | 0x1) + zlib.compress(data)
\ No newline at end of file
+    return write_header(CompressionType.ZLib, len(data)) + zlib.compress(data)
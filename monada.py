@@ -0,0 +1,214 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
+import glob
+import hashlib
+import json
+import mmap
+import os
+import sys
+import time
+
+from cache import DecompileCache
+from columnar import save_columnar
+from namehash import NameDictionary
+from xseq import BufferPool, ParseContext, ParseStats, ReadContainer, ReadFunctions, ReadJumps, open_xseq, open_xseq_path, probe_xseq, to_txt
+
+def FindScripts(patterns):
+    """Expand directories and globs into (source, relative output path) pairs."""
+    scripts = {}
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for source in glob.glob(os.path.join(pattern, "**", "*.xq"), recursive=True):
+                scripts[source] = os.path.relpath(source, pattern)
+        else:
+            sources = glob.glob(pattern, recursive=True) if glob.has_magic(pattern) else [pattern]
+            for source in sources:
+                scripts.setdefault(source, os.path.basename(source))
+    return list(scripts.items())
+
+# Output formats of 'decompile': writer(path, script, stats) and file extension.
+Formats = {
+    "txt": (to_txt, ".txt"),
+    "columnar": (save_columnar, ".xqc"),
+}
+
+# Each worker process maps a NameDictionary once and reuses it for every file.
+WorkerNames = {}
+
+def OpenNames(path):
+    if not path:
+        return None
+    names = WorkerNames.get(path)
+    if names is None:
+        names = WorkerNames[path] = NameDictionary(path)
+    return names
+
+# Each worker process decompresses every table it parses into these arenas.
+WorkerBuffers = BufferPool()
+
+def DecompileFile(source, destination, cache=None, names=None, profile=False, outputFormat="txt"):
+    """Return (served from cache, error message or None, ParseStats.ToDict() or None)."""
+    stats = ParseStats() if profile else None
+    write = Formats[outputFormat][0]
+    try:
+        os.makedirs(os.path.dirname(destination) or ".", exist_ok=True)
+        if cache is None:
+            context = ParseContext(OpenNames(names), stats)
+            write(destination, open_xseq_path(source, context=context, buffers=WorkerBuffers), stats)
+            return False, None, stats and stats.ToDict()
+
+        with open(source, "rb") as file:
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        key = cache.Key(data)
+        if cache.Get(key, destination):
+            return True, None, None
+        context = ParseContext(OpenNames(names), stats)
+        write(destination, open_xseq(data, context=context, buffers=WorkerBuffers), stats)
+        cache.Put(key, destination)
+    except Exception as e:
+        return False, f"{type(e).__name__}: {e}", None
+    return False, None, stats and stats.ToDict()
+
+def Decompile(args):
+    scripts = FindScripts(args.inputs)
+    sizes = {source: os.path.getsize(source) for source, _ in scripts}
+    # Largest first, so one big script does not start last and run alone.
+    scripts.sort(key=lambda script: sizes[script[0]], reverse=True)
+
+    cache = None
+    if args.cache:
+        salt = args.format.encode()
+        if args.names:
+            # Output depends on the dictionary, so entries are keyed by it too.
+            with open(args.names, "rb") as file:
+                salt += hashlib.blake2b(file.read()).digest()
+        cache = DecompileCache(args.cache, args.cache_size * 2**20, salt)
+
+    failures = 0
+    hits = 0
+    stats = ParseStats() if args.profile else None
+    start = time.perf_counter()
+    extension = Formats[args.format][1]
+    with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        futures = {
+            executor.submit(DecompileFile, source, os.path.join(args.output, os.path.splitext(relative)[0] + extension),
+                            cache, args.names, bool(args.profile), args.format): source
+            for source, relative in scripts
+        }
+        for future in as_completed(futures):
+            cached, error, fileStats = future.result()
+            hits += cached
+            if fileStats:
+                stats.Merge(fileStats)
+            if error:
+                failures += 1
+                print(f"{futures[future]}: {error}", file=sys.stderr)
+    if cache:
+        cache.Evict()
+    elapsed = time.perf_counter() - start
+
+    total = sum(sizes.values())
+    print(f"{len(scripts) - failures}/{len(scripts)} files decompiled in {elapsed:.2f} s "
+          f"({len(scripts) / elapsed:.1f} files/s, {total / elapsed / 2**20:.2f} MiB/s)"
+          + (f", {hits} from cache" if cache else ""))
+    if stats:
+        WriteProfile(args.profile, args.profile_format, stats, len(scripts) - hits - failures, elapsed)
+    return 1 if failures else 0
+
+def WriteProfile(path, profileFormat, stats, files, elapsed):
+    with open(path, "w") as file:
+        if profileFormat == "folded":
+            file.write(stats.ToFolded())
+        else:
+            # Stage times are summed over worker processes, so they can add up
+            # to more than the elapsed time.
+            json.dump({"files": files, "elapsed": elapsed, **stats.ToDict()}, file, indent=2)
+
+def CollectNames(source):
+    """Return (function and jump names, error message or None)."""
+    try:
+        with open(source, "rb") as file:
+            container, length = ReadContainer(memoryview(file.read()))
+        context = ParseContext()
+        functions = ReadFunctions(container.FunctionTable, container.StringTable, length, context)
+        jumps = ReadJumps(container.JumpTable, container.StringTable, length, context)
+    except Exception as e:
+        return [], f"{type(e).__name__}: {e}"
+    return [function.Name for function in functions] + [jump.Name for jump in jumps], None
+
+def Names(args):
+    names = set()
+    for path in args.list or ():
+        with open(path, encoding="utf-8") as file:
+            names.update(line.strip() for line in file if line.strip())
+
+    failures = 0
+    scripts = FindScripts(args.inputs)
+    with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        futures = {executor.submit(CollectNames, source): source for source, _ in scripts}
+        for future in as_completed(futures):
+            found, error = future.result()
+            names.update(name for name in found if name)
+            if error:
+                failures += 1
+                print(f"{futures[future]}: {error}", file=sys.stderr)
+
+    count = NameDictionary.Build(args.output, names)
+    print(f"{count} names from {len(scripts) - failures}/{len(scripts)} files written to {args.output}")
+    return 1 if failures else 0
+
+def Probe(args):
+    failures = 0
+    for source, _ in FindScripts(args.inputs):
+        try:
+            probe = probe_xseq(source)
+        except Exception as e:
+            failures += 1
+            print(f"{source}: {type(e).__name__}: {e}", file=sys.stderr)
+            continue
+        tables = {}
+        for name in ("FunctionTable", "JumpTable", "InstructionTable", "ArgumentTable", "StringTable"):
+            table = getattr(probe, name)
+            tables[name] = {"count": table.Count, "method": table.Method.name, "size": table.Size}
+        print(json.dumps({
+            "path": source,
+            "tables": tables,
+            "globalVariableCount": probe.GlobalVariableCount,
+            "length": probe.Length.name if probe.Length else None,
+        }))
+    return 1 if failures else 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="monada", description="XSEQ script tools.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    decompile = commands.add_parser("decompile", help="decompile .xq scripts to text")
+    decompile.add_argument("inputs", nargs="+", help="script files, directories or glob patterns")
+    decompile.add_argument("-o", "--output", default=".", help="output directory")
+    decompile.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="worker processes")
+    decompile.add_argument("--cache", help="directory of cached output, keyed by script content")
+    decompile.add_argument("--cache-size", type=int, default=1024, help="cache size limit in MiB")
+    decompile.add_argument("-f", "--format", choices=list(Formats), default="txt",
+                           help="text, or columnar binary files for columnar.load_columnar")
+    decompile.add_argument("--names", help="name dictionary used to resolve hashes (see 'names')")
+    decompile.add_argument("--profile", help="write time, bytes and records per stage and table to this file")
+    decompile.add_argument("--profile-format", choices=("json", "folded"), default="json",
+                           help="JSON, or folded stacks for flamegraph.pl and speedscope")
+    decompile.set_defaults(run=Decompile)
+
+    names = commands.add_parser("names", help="build a hash to name dictionary from a corpus")
+    names.add_argument("inputs", nargs="*", help="script files, directories or glob patterns")
+    names.add_argument("-o", "--output", required=True, help="dictionary file to write")
+    names.add_argument("-l", "--list", action="append", help="text file of extra names, one per line")
+    names.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="worker processes")
+    names.set_defaults(run=Names)
+
+    probe = commands.add_parser("probe", help="print table counts, methods and sizes as JSON lines")
+    probe.add_argument("inputs", nargs="+", help="script files, directories or glob patterns")
+    probe.set_defaults(run=Probe)
+
+    args = parser.parse_args(argv)
+    return args.run(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+import mmap
+import os
+import zlib
+from struct import Struct
+
+def MakeCrc16Table():
+    table = []
+    for i in range(256):
+        crc = i
+        for _ in range(8):
+            crc = crc >> 1 ^ 0x8408 if crc & 1 else crc >> 1
+        table.append(crc)
+    return table
+
+Crc16Table = MakeCrc16Table()
+
+def Crc16(data):
+    # CRC-16/X-25, the hash stored next to function and jump names.
+    crc = 0xFFFF
+    for byte in data:
+        crc = crc >> 8 ^ Crc16Table[(crc ^ byte) & 0xFF]
+    return crc ^ 0xFFFF
+
+def Crc32(data):
+    return zlib.crc32(data)
+
+def NameHashes(name):
+    data = name.encode("shift-jis")
+    return Crc16(data), Crc32(data)
+
+class NameDictionary:
+    """
+    Hash to name lookups backed by a file that is mmapped, not loaded:
+
+        header   magic, CRC16 record count, CRC32 record count, pool offset
+        records  (hash, name offset) pairs, CRC16 ones then CRC32 ones,
+                 each sorted by hash, then by name
+        pool     NUL-terminated UTF-8 names
+
+    A lookup is a binary search over the records of one hash width, so
+    only the touched pages of the file are ever read.
+    """
+
+    Header = Struct("<4s III")
+    Record = Struct("<II")
+    Magic = b"XQND"
+
+    def __init__(self, path):
+        with open(path, "rb") as file:
+            self.Data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, crc16Count, crc32Count, self.PoolOffset = self.Header.unpack_from(self.Data)
+        if magic != self.Magic:
+            raise ValueError(f"Wrong name dictionary format, got: {magic}, expected: {self.Magic}.")
+        self.Sections = {
+            16: (self.Header.size, crc16Count),
+            32: (self.Header.size + crc16Count * self.Record.size, crc32Count),
+        }
+
+    def __len__(self):
+        return sum(count for _, count in self.Sections.values())
+
+    def close(self):
+        self.Data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def GetName(self, offset):
+        end = self.Data.find(b"\x00", self.PoolOffset + offset)
+        return self.Data[self.PoolOffset + offset:end].decode("utf-8")
+
+    def Find(self, value, bits):
+        """All names whose CRC16 or CRC32 (by `bits`) is `value`."""
+        start, count = self.Sections[bits]
+        unpack = self.Record.unpack_from
+        size = self.Record.size
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            if unpack(self.Data, start + middle * size)[0] < value:
+                low = middle + 1
+            else:
+                high = middle
+
+        names = []
+        while low < count:
+            recordValue, offset = unpack(self.Data, start + low * size)
+            if recordValue != value:
+                break
+            names.append(self.GetName(offset))
+            low += 1
+        return names
+
+    def Get(self, value):
+        # StringHash arguments are 32-bit; anything wider than 16 bits can
+        # only be a CRC32.
+        names = self.Find(value, 16 if 0 <= value <= 0xFFFF else 32)
+        return names[0] if names else None
+
+    @classmethod
+    def Build(cls, path, names):
+        names = sorted(set(names))
+        pool = bytearray()
+        crc16Records = []
+        crc32Records = []
+        for name in names:
+            try:
+                crc16, crc32 = NameHashes(name)
+            except UnicodeEncodeError:
+                continue
+            offset = len(pool)
+            pool += name.encode("utf-8") + b"\x00"
+            crc16Records.append((crc16, offset))
+            crc32Records.append((crc32, offset))
+        # Names were added in order, so equal hashes stay sorted by name.
+        crc16Records.sort(key=lambda record: record[0])
+        crc32Records.sort(key=lambda record: record[0])
+
+        records = crc16Records + crc32Records
+        data = bytearray(cls.Header.pack(
+            cls.Magic, len(crc16Records), len(crc32Records),
+            cls.Header.size + len(records) * cls.Record.size))
+        for record in records:
+            data += cls.Record.pack(*record)
+        data += pool
+
+        # Written next to the target and renamed, so readers never see half a file.
+        temporary = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(temporary, "wb") as file:
+                file.write(data)
+            os.replace(temporary, path)
+        except BaseException:
+            os.remove(temporary)
+            raise
+        return len(crc16Records)
@@ -1,16 +1,20 @@
 from compression import *
-from struct import pack, unpack, unpack_from, Struct
+from namehash import Crc32
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from struct import pack, unpack, Struct
 from io import BytesIO
 from enum import Enum
+from time import perf_counter
+import mmap
+import os
 import re
+import threading
+import warnings
+
+# Bump whenever the decompiled text changes, so cached output is rebuilt.
+DecompilerVersion = 2
 
-class CompressionType(Enum):
-    null = 0
-    Level5_Lz10 = 1
-    Level5_Huffman4Bit = 2
-    Level5_Huffman8Bit = 3
-    Level5_Rle = 4
-    ZLib = 5
 class PointerLength(Enum):
     Int = 0
     Long = 1
@@ -53,10 +57,30 @@ class ScriptContainer:
 
 class ScriptTable:
     def __init__(self, data):
-        self.EntryCount, self.Stream = data
+        self.EntryCount, self.Data = data
+Terminator = re.compile(b"\x00")
 class ScriptStringTable:
+    # Set while profiling: where lookups are recorded, and for which table.
+    # Lookups outside a timed decode come from lazily decoded functions.
+    Stats = None
+    Table = "deferred"
+    
     def __init__(self, data):
-        self.Stream = data
+        self.Data = data
+        self.View = memoryview(data)
+        self.Strings = {}
+    
+    def GetString(self, offset):
+        text = self.Strings.get(offset)
+        if text is None:
+            stats = self.Stats
+            start = perf_counter() if stats is not None else 0
+            end = Terminator.search(self.Data, offset)
+            end = end.start() if end else len(self.Data)
+            text = self.Strings[offset] = str(self.View[offset:end], "shift-jis")
+            if stats is not None:
+                stats.Record("strings", self.Table, perf_counter() - start, end - offset, len(text), 1)
+        return text
 
 class ScriptFunction:
     strct = "<%ds hh hh i hh"
@@ -86,6 +110,10 @@ class ScriptArgument:
 
 class XseqFunction:
     strct = Struct("<l H hhhhhhh")
+    layouts = {
+        PointerLength.Int: Struct("<I HHHHHHHH"),
+        PointerLength.Long: Struct("<Q HHHHHHHH"),
+    }
     def __init__(self, data):
         self.nameOffset, \
         self.crc16, \
@@ -98,12 +126,20 @@ class XseqFunction:
         self.parameterCount = data
 class XseqJump:
     strct = Struct("<l H h")
+    layouts = {
+        PointerLength.Int: Struct("<i H h"),
+        PointerLength.Long: Struct("<q H h 4x"),
+    }
     def __init__(self, data):
         self.nameOffset, \
         self.crc16, \
         self.instructionIndex = data
 class XseqInstruction:
     strct = Struct("<hhhhi")
+    layouts = {
+        PointerLength.Int: Struct("<hhhh i"),
+        PointerLength.Long: Struct("<hhhh q"),
+    }
     def __init__(self, data):
         self.argOffset, \
         self.argCount, \
@@ -112,6 +148,10 @@ class XseqInstruction:
         self.zero0 = data
 class XseqArgument:
     strct = Struct("<iI")
+    layouts = {
+        PointerLength.Int: Struct("<i I"),
+        PointerLength.Long: Struct("<i 4x I 4x"),
+    }
     def __init__(self, data):
         self.type, self.value = data
 
@@ -123,8 +163,194 @@ class ScriptFile:
         self.Arguments, \
         self.Length = data
 
-def open_xseq(data):
-    header = XseqHeader(unpack("<4s hH Hh Hh Hh hH", data.read(24)))
+class ParseContext:
+    """
+    State of one parse: name hashes seen in the function and jump tables,
+    used to resolve StringHash arguments, an optional NameDictionary
+    consulted for hashes the script itself does not name, and optional
+    ParseStats to record into. Never share one between threads.
+    """
+
+    def __init__(self, names=None, stats=None):
+        self.FunctionNames = {}
+        self.JumpNames = {}
+        self.Names = names
+        self.Stats = stats
+    
+    @staticmethod
+    def AddName(hashes, crc16, name):
+        # Keyed by the stored CRC16 and by the CRC32 of the name, which is
+        # what some games store in StringHash arguments instead.
+        for key in (crc16, Crc32(name.encode("shift-jis"))):
+            names = hashes.setdefault(key, [])
+            if name not in names:
+                names.append(name)
+    
+    def AddFunctionName(self, crc16, name):
+        self.AddName(self.FunctionNames, crc16, name)
+    
+    def AddJumpName(self, crc16, name):
+        self.AddName(self.JumpNames, crc16, name)
+
+class StageStats:
+    def __init__(self):
+        self.Seconds = 0.0
+        self.BytesIn = 0
+        self.BytesOut = 0
+        self.Records = 0
+        self.Calls = 0
+
+class ParseStats:
+    """
+    Wall time, bytes in and out and record counts per stage and table,
+    summed over every parse it is passed to through a ParseContext (and
+    every to_txt call it is passed to). Stages are "decompress", "decode",
+    "strings" and "render"; string lookups are recorded under the table
+    being decoded and are part of that table's decode time.
+    """
+
+    def __init__(self):
+        self.Stages = {}
+        self.Lock = threading.Lock()
+
+    def Record(self, stage, table, seconds, bytesIn=0, bytesOut=0, records=0):
+        with self.Lock:
+            entry = self.Stages.get((stage, table))
+            if entry is None:
+                entry = self.Stages[(stage, table)] = StageStats()
+            entry.Seconds += seconds
+            entry.BytesIn += bytesIn
+            entry.BytesOut += bytesOut
+            entry.Records += records
+            entry.Calls += 1
+
+    def Merge(self, stats):
+        # Accepts another ParseStats or its ToDict(), e.g. from a worker process.
+        entries = stats.ToDict()["stages"] if isinstance(stats, ParseStats) else stats["stages"]
+        with self.Lock:
+            for item in entries:
+                entry = self.Stages.get((item["stage"], item["table"]))
+                if entry is None:
+                    entry = self.Stages[(item["stage"], item["table"])] = StageStats()
+                entry.Seconds += item["seconds"]
+                entry.BytesIn += item["bytesIn"]
+                entry.BytesOut += item["bytesOut"]
+                entry.Records += item["records"]
+                entry.Calls += item["calls"]
+
+    def ToDict(self):
+        with self.Lock:
+            return {"stages": [{
+                "stage": stage,
+                "table": table,
+                "seconds": entry.Seconds,
+                "bytesIn": entry.BytesIn,
+                "bytesOut": entry.BytesOut,
+                "records": entry.Records,
+                "calls": entry.Calls,
+            } for (stage, table), entry in sorted(self.Stages.items(), key=lambda item: item[0])]}
+
+    def ToFolded(self, root="xseq"):
+        """Folded stacks in microseconds, as read by flamegraph.pl and speedscope."""
+        with self.Lock:
+            stages = dict(self.Stages)
+        lines = []
+        for (stage, table), entry in sorted(stages.items(), key=lambda item: item[0]):
+            seconds = entry.Seconds
+            if stage == "strings":
+                lines.append(f"{root};decode;{table};strings {round(seconds * 1e6)}")
+                continue
+            if stage == "decode" and ("strings", table) in stages:
+                seconds -= stages[("strings", table)].Seconds
+            lines.append(f"{root};{stage};{table} {round(max(seconds, 0) * 1e6)}")
+        return "\n".join(lines) + "\n"
+
+def ReadTimed(stats, table, strings, read, *args):
+    # args[0] is always the table being decoded.
+    if stats is None:
+        return read(*args)
+    strings.Table = table
+    start = perf_counter()
+    result = read(*args)
+    stats.Record("decode", table, perf_counter() - start, len(args[0].Data), 0, len(result))
+    strings.Table = ScriptStringTable.Table
+    return result
+
+def GetBuffer(data):
+    if isinstance(data, BytesIO):
+        return data.getbuffer()
+    return memoryview(data)
+
+tablePool = None
+tablePoolLock = threading.Lock()
+def GetTablePool():
+    # One pool shared by every concurrent parse in the process.
+    global tablePool
+    with tablePoolLock:
+        if tablePool is None:
+            tablePool = ThreadPoolExecutor(thread_name_prefix="xseq-table")
+        return tablePool
+
+class Arena(bytearray):
+    # Marks the buffers a BufferPool lent out; arenas never released are
+    # simply collected.
+    pass
+
+class BufferPool:
+    """
+    Reusable arenas for decompressed tables in batch runs. Acquire returns a
+    bytearray of at least `size` bytes, rounded up to a power of two so a
+    few arenas serve tables of every size; Release hands it back once no
+    view into it is used any more. At most `maxCount` free arenas are kept.
+    """
+    
+    def __init__(self, maxCount=16):
+        self.MaxCount = maxCount
+        self.Free = []
+        self.Lock = threading.Lock()
+        self.Allocated = 0
+        self.Reused = 0
+    
+    def Acquire(self, size):
+        with self.Lock:
+            for i, arena in enumerate(self.Free):
+                if len(arena) >= size:
+                    self.Reused += 1
+                    del self.Free[i]
+                    break
+            else:
+                self.Allocated += 1
+                arena = Arena(max(1 << (size - 1).bit_length(), 0x1000))
+            return arena
+    
+    def Release(self, arena):
+        with self.Lock:
+            if not isinstance(arena, Arena):
+                # Not one of ours, e.g. the source of a stored table.
+                return
+            # Smallest first, so Acquire takes the tightest fit.
+            self.Free.insert(bisect_right([len(free) for free in self.Free], len(arena)), arena)
+            if len(self.Free) > self.MaxCount:
+                del self.Free[0]
+    
+    def ReleaseContainer(self, container):
+        tables = (container.FunctionTable.Data, container.JumpTable.Data, container.InstructionTable.Data,
+                  container.ArgumentTable.Data, container.StringTable.Data)
+        for data in tables:
+            self.Release(data.obj)
+
+# Only zlib releases the GIL while it works, and below this compressed size
+# handing a table to the pool costs more than decoding it in place.
+ConcurrentMinimumSize = 0x10000
+
+def IsWorthConcurrent(data, start, end):
+    if end - start < ConcurrentMinimumSize:
+        return False
+    method, _ = read_header(data[start:start + HEADER_SIZE])
+    return method == CompressionType.ZLib
+
+def ReadContainer(data, executor=None, stats=None, buffers=None):
+    header = XseqHeader(XseqHeader.strct.unpack_from(data))
     if header.magic != b"XSEQ":
         raise ValueError(f"Wrong xq format, got: {header.magic}, expected: b'XSEQ'.")
     
@@ -133,22 +359,51 @@ def open_xseq(data):
     
     hasCompression = HasCompression(functionTable, jumpTable, instructionTable, argumentTable, stringOffset)
     
-    container = ScriptContainer((
-        ReadTable(data, functionTable, jumpTable.offset, hasCompression),
-        ReadTable(data, jumpTable, instructionTable.offset, hasCompression),
-        ReadTable(data, instructionTable, argumentTable.offset, hasCompression),
-        ReadTable(data, argumentTable, stringOffset, hasCompression),
-        ReadStringTable(data, stringOffset, hasCompression),
-        header.globalVariableCount,
-    ))
+    reads = (
+        (ReadTable, data, functionTable, jumpTable.offset, hasCompression, "function", stats, buffers),
+        (ReadTable, data, jumpTable, instructionTable.offset, hasCompression, "jump", stats, buffers),
+        (ReadTable, data, instructionTable, argumentTable.offset, hasCompression, "instruction", stats, buffers),
+        (ReadTable, data, argumentTable, stringOffset, hasCompression, "argument", stats, buffers),
+        (ReadStringTable, data, stringOffset, hasCompression, stats, buffers),
+    )
+    if executor is not None and hasCompression:
+        bounds = zip((functionTable.offset, jumpTable.offset, instructionTable.offset, argumentTable.offset, stringOffset),
+                     (jumpTable.offset, instructionTable.offset, argumentTable.offset, stringOffset, len(data)))
+        futures = [executor.submit(*read) if IsWorthConcurrent(data, start, end) else None
+                   for read, (start, end) in zip(reads, bounds)]
+        # The rest are decoded here while the pool works.
+        tables = [read[0](*read[1:]) if future is None else None for read, future in zip(reads, futures)]
+        tables = [table if future is None else future.result() for table, future in zip(tables, futures)]
+    else:
+        tables = [read[0](*read[1:]) for read in reads]
+    
+    container = ScriptContainer((*tables, header.globalVariableCount))
     
     tdpl, length = TryDetectPointerLength(container)
     if not tdpl: raise ValueError("Could not detect pointer length.")
     
-    functions = ReadFunctions(container.FunctionTable, container.StringTable, length)
-    jumps = ReadJumps(container.JumpTable, container.StringTable, length)
-    instructions = ReadInstructions(container.InstructionTable, length)
-    arguments = ReadArguments(container.ArgumentTable, instructions, container.StringTable, length)
+    return container, length
+
+def open_xseq(data, concurrent=False, context=None, buffers=None):
+    # With a BufferPool, tables are decompressed into its arenas, which are
+    # handed back once parsed: the ScriptFile keeps no view into them.
+    context = context or ParseContext()
+    stats = context.Stats
+    container, length = ReadContainer(GetBuffer(data), GetTablePool() if concurrent else None, stats, buffers)
+    strings = container.StringTable
+    
+    try:
+        functions = ReadTimed(stats, "function", strings,
+                              ReadFunctions, container.FunctionTable, strings, length, context)
+        jumps = ReadTimed(stats, "jump", strings,
+                          ReadJumps, container.JumpTable, strings, length, context)
+        instructions = ReadTimed(stats, "instruction", strings,
+                                 ReadInstructions, container.InstructionTable, length)
+        arguments = ReadTimed(stats, "argument", strings,
+                              ReadArguments, container.ArgumentTable, instructions, strings, length, context)
+    finally:
+        if buffers is not None:
+            buffers.ReleaseContainer(container)
     
     return ScriptFile((
         functions,
@@ -158,25 +413,244 @@ def open_xseq(data):
         length,
     ))
 
-def ReadTable(data, tableData, nextOffset, hasCompression):
-    data.seek(tableData.offset)
+class LazyTable:
+    """
+    Sequence over a script table whose records are decoded on first access.
+    `load(index)` decodes at least the record at `index` into `Items`.
+    """
+
+    def __init__(self, count, load):
+        self.Items = [None] * count
+        self.load = load
+
+    def __len__(self):
+        return len(self.Items)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self.Items)))]
+        item = self.Items[index]
+        if item is None:
+            self.load(index % len(self.Items))
+            item = self.Items[index]
+        return item
+
+    def __iter__(self):
+        for i in range(len(self.Items)):
+            yield self[i]
+
+class LazyScriptFile(ScriptFile):
+    """
+    ScriptFile that decodes the function table up front, and the jumps,
+    instructions and arguments of a function only once something in that
+    function is accessed.
+    """
+
+    def __init__(self, container, length, context=None):
+        self.Container = container
+        self.Length = length
+        self.Context = context = context or ParseContext()
+        self.Functions = ReadTimed(context.Stats, "function", container.StringTable,
+                                   ReadFunctions, container.FunctionTable, container.StringTable, length, context)
+        self.Jumps = LazyTable(container.JumpTable.EntryCount, self.LoadJump)
+        self.Instructions = LazyTable(container.InstructionTable.EntryCount, self.LoadInstruction)
+        self.Arguments = LazyTable(container.ArgumentTable.EntryCount, self.LoadArgument)
+        
+        self.loaded = [False] * len(self.Functions)
+        self.jumpNamesLoaded = False
+        # Functions are sorted by InstructionIndex; jump ranges need their own order.
+        self.instructionStarts = [function.InstructionIndex for function in self.Functions]
+        self.jumpOrder = sorted(range(len(self.Functions)), key=lambda i: self.Functions[i].JumpIndex)
+        self.jumpStarts = [self.Functions[i].JumpIndex for i in self.jumpOrder]
+        self.argumentOwners = None
+
+    def LoadFunction(self, functionIndex):
+        if self.loaded[functionIndex]:
+            return
+        self.loaded[functionIndex] = True
+        function = self.Functions[functionIndex]
+        container = self.Container
+        self.LoadJumpNames()
+        
+        start, count = function.JumpIndex, function.JumpCount
+        self.Jumps.Items[start:start + count] = CreateJumps(
+            ReadEntries(container.JumpTable, XseqJump, self.Length, start, count), container.StringTable, self.Context)
+        
+        start, count = function.InstructionIndex, function.InstructionCount
+        instructions = CreateInstructions(
+            ReadEntries(container.InstructionTable, XseqInstruction, self.Length, start, count))
+        self.Instructions.Items[start:start + count] = instructions
+        
+        for instruction in instructions:
+            for i in range(instruction.ArgumentCount):
+                self.DecodeArgument(instruction.ArgumentIndex + i, instruction.Type, i)
+
+    def LoadJumpNames(self):
+        # Arguments may name any jump of the script, not just the ones of
+        # their own function.
+        if self.jumpNamesLoaded:
+            return
+        self.jumpNamesLoaded = True
+        for jump in ReadEntries(self.Container.JumpTable, XseqJump, self.Length):
+            self.Context.AddJumpName(jump.crc16, self.Container.StringTable.GetString(jump.nameOffset))
+
+    def FindFunction(self, starts, order, index, countName):
+        position = bisect_right(starts, index) - 1
+        if position < 0:
+            return None
+        functionIndex = order[position] if order else position
+        function = self.Functions[functionIndex]
+        if index < starts[position] + getattr(function, countName):
+            return functionIndex
+        return None
+
+    def LoadJump(self, index):
+        functionIndex = self.FindFunction(self.jumpStarts, self.jumpOrder, index, "JumpCount")
+        if functionIndex is not None:
+            self.LoadFunction(functionIndex)
+        if self.Jumps.Items[index] is None:
+            container = self.Container
+            self.Jumps.Items[index] = CreateJumps(
+                ReadEntries(container.JumpTable, XseqJump, self.Length, index, 1), container.StringTable, self.Context)[0]
+
+    def LoadInstruction(self, index):
+        functionIndex = self.FindFunction(self.instructionStarts, None, index, "InstructionCount")
+        if functionIndex is not None:
+            self.LoadFunction(functionIndex)
+        if self.Instructions.Items[index] is None:
+            self.Instructions.Items[index] = CreateInstructions(
+                ReadEntries(self.Container.InstructionTable, XseqInstruction, self.Length, index, 1))[0]
+
+    def LoadArgument(self, index):
+        # An argument is decoded in the context of the instruction using it,
+        # which is only known after scanning the instruction table once.
+        if self.argumentOwners is None:
+            self.argumentOwners = owners = {}
+            layout = XseqInstruction.layouts[self.Length]
+            table = self.Container.InstructionTable
+            entries = layout.iter_unpack(table.Data[:layout.size * table.EntryCount])
+            for instructionIndex, (argumentIndex, argumentCount, _, _, _) in enumerate(entries):
+                for i in range(argumentCount):
+                    owners[argumentIndex + i] = instructionIndex
+        
+        instructionIndex = self.argumentOwners.get(index)
+        if instructionIndex is None:
+            self.DecodeArgument(index, None, 0)
+            return
+        instruction = self.Instructions[instructionIndex]
+        if self.Arguments.Items[index] is None:
+            # The instruction is outside every function, so loading it
+            # decoded none of its arguments.
+            self.DecodeArgument(index, instruction.Type, index - instruction.ArgumentIndex)
+
+    def DecodeArgument(self, index, instructionType, argumentIndex):
+        layout = XseqArgument.layouts[self.Length]
+        argumentType, argumentValue = layout.unpack_from(self.Container.ArgumentTable.Data, layout.size * index)
+        self.Arguments.Items[index] = ScriptArgument(CreateArgumentValues(
+            argumentType, argumentValue, instructionType, argumentIndex, self.Container.StringTable, self.Context))
+
+def open_xseq_lazy(data, concurrent=False, context=None):
+    context = context or ParseContext()
+    container, length = ReadContainer(GetBuffer(data), GetTablePool() if concurrent else None, context.Stats)
+    return LazyScriptFile(container, length, context)
+
+def open_xseq_path(path, lazy=False, concurrent=False, context=None, buffers=None):
+    # The mapping is released once the last table view into it is dropped.
+    with open(path, "rb") as file:
+        data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    if lazy:
+        # Lazy scripts keep their tables, so they cannot share pooled arenas.
+        return open_xseq_lazy(data, concurrent, context)
+    return open_xseq(data, concurrent, context, buffers)
+
+class TableProbe:
+    def __init__(self, data):
+        self.Count, \
+        self.Method, \
+        self.Size = data
+
+class ScriptProbe:
+    def __init__(self, data):
+        self.FunctionTable, self.JumpTable, self.InstructionTable, self.ArgumentTable, \
+        self.StringTable, self.GlobalVariableCount, self.Length = data
+
+def probe_xseq(path):
+    """
+    Read only the header and the Level5 header of each table. Sizes are the
+    decompressed table sizes; Length is None if no pointer length fits.
+    """
+    with open(path, "rb") as file:
+        data = file.read(XseqHeader.strct.size)
+        if len(data) < XseqHeader.strct.size:
+            raise ValueError("File is too short for an xq header.")
+        header = XseqHeader(XseqHeader.strct.unpack(data))
+        if header.magic != b"XSEQ":
+            raise ValueError(f"Wrong xq format, got: {header.magic}, expected: b'XSEQ'.")
+        
+        functionTable, jumpTable, instructionTable, argumentTable, stringOffset = \
+            header.GetTableData()
+        hasCompression = HasCompression(functionTable, jumpTable, instructionTable, argumentTable, stringOffset)
+        
+        tables = (functionTable, jumpTable, instructionTable, argumentTable, TableData(stringOffset, 0))
+        ends = (jumpTable.offset, instructionTable.offset, argumentTable.offset, stringOffset,
+                os.fstat(file.fileno()).st_size)
+        probes = []
+        for table, end in zip(tables, ends):
+            method, size = CompressionType.null, max(end - table.offset, 0)
+            if hasCompression and size >= 4:
+                file.seek(table.offset)
+                method, size = read_header(file.read(HEADER_SIZE))
+            probes.append(TableProbe((table.count, method, size)))
+    
+    length = None
+    for i in range(2):
+        if all(probe.Count * GetEntrySize(PointerLength(i)) == probe.Size - probe.Size % 4
+               for probe, GetEntrySize in zip(probes, (GetFunctionEntrySize, GetJumpEntrySize,
+                                                       GetInstructionEntrySize, GetArgumentEntrySize))):
+            length = PointerLength(i)
+            break
+    
+    return ScriptProbe((*probes, header.globalVariableCount, length))
+
+def DecompressTable(data, buffers=None):
+    method, size = read_header(data)
+    if method == CompressionType.null:
+        # Stored tables are parsed in place.
+        if len(data) - HEADER_SIZE < size:
+            raise TruncatedDataError("Level5 null data ended early")
+        return data[HEADER_SIZE:HEADER_SIZE + size]
+    if buffers is None:
+        return memoryview(decompress(data))
+    arena = buffers.Acquire(size)
+    try:
+        decompress_into(data, arena)
+    except Exception:
+        buffers.Release(arena)
+        raise
+    return memoryview(arena)[:size]
+
+def ReadTable(data, tableData, nextOffset, hasCompression, name=None, stats=None, buffers=None):
+    start = perf_counter()
+    data = raw = data[tableData.offset:nextOffset]
     if hasCompression:
-        data = decompress(data.read(nextOffset - tableData.offset))
-    else:
-        data = data.read(nextOffset - tableData.offset)
-    while len(data) % 4 != 0:
-        data = data[:len(data) - 1]
+        data = DecompressTable(data, buffers)
+    data = data[:len(data) - len(data) % 4]
+    if stats is not None:
+        stats.Record("decompress", name, perf_counter() - start, len(raw), len(data), tableData.count)
     
-    return ScriptTable((tableData.count, BytesIO(data)))
+    return ScriptTable((tableData.count, data))
 
-def ReadStringTable(data, offset, hasCompression):
-    data.seek(offset)
+def ReadStringTable(data, offset, hasCompression, stats=None, buffers=None):
+    start = perf_counter()
+    data = raw = data[offset:]
     if hasCompression:
-        data = BytesIO(decompress(data.read(len(data.getvalue()) - offset)))
-    else:
-        data = BytesIO(data.read(len(data.getvalue()) - offset))
+        data = DecompressTable(data, buffers)
     
-    return ScriptStringTable((data))
+    table = ScriptStringTable(data)
+    if stats is not None:
+        stats.Record("decompress", "string", perf_counter() - start, len(raw), len(data))
+        table.Stats = stats
+    return table
 
 def HasCompression(functionTable, jumpTable, instructionTable, argumentTable, stringOffset):
     for i in range(2):
@@ -189,7 +663,7 @@ def HasCompression(functionTable, jumpTable, instructionTable, argumentTable, st
         entrySize = GetInstructionEntrySize(PointerLength(i))
         if instructionTable.count * entrySize != argumentTable.offset - instructionTable.offset:
             continue
-        entrySize = etArgumentEntrySize(PointerLength(i))
+        entrySize = GetArgumentEntrySize(PointerLength(i))
         if argumentTable.count * entrySize != stringOffset - argumentTable.offset:
             continue
         return False
@@ -200,16 +674,16 @@ def TryDetectPointerLength(container):
     for i in range(2):
         localLength = PointerLength(i)
         entrySize = GetFunctionEntrySize(localLength)
-        if container.FunctionTable.EntryCount * entrySize != len(container.FunctionTable.Stream.getvalue()):
+        if container.FunctionTable.EntryCount * entrySize != len(container.FunctionTable.Data):
             continue
         entrySize = GetJumpEntrySize(localLength)
-        if container.JumpTable.EntryCount * entrySize != len(container.JumpTable.Stream.getvalue()):
+        if container.JumpTable.EntryCount * entrySize != len(container.JumpTable.Data):
             continue
         entrySize = GetInstructionEntrySize(localLength)
-        if container.InstructionTable.EntryCount * entrySize != len(container.InstructionTable.Stream.getvalue()):
+        if container.InstructionTable.EntryCount * entrySize != len(container.InstructionTable.Data):
             continue
         entrySize = GetArgumentEntrySize(localLength)
-        if container.ArgumentTable.EntryCount * entrySize != len(container.ArgumentTable.Stream.getvalue()):
+        if container.ArgumentTable.EntryCount * entrySize != len(container.ArgumentTable.Data):
             continue
         length = localLength
         return True, length
@@ -228,43 +702,25 @@ def GetArgumentEntrySize(length):
     if length == PointerLength.Int: return 0x8
     elif length == PointerLength.Long: return 0x10
 
-def ReadFunctions(functionTable, StringTable, length):
-    result = []
-    data = functionTable.Stream
-    entryCount = functionTable.EntryCount
-    
-    for i in range(entryCount):
-        nameOffset = 0
-        if length == PointerLength.Int:
-            nameOffset = unpack("<I", data.read(4))[0]
-        elif length == PointerLength.Long:
-            nameOffset = unpack("<L", data.read(8))[0]
-        else:
-            raise ValueError(f"Unknown pointer length {length}.")
-        
-        result.append(XseqFunction((
-            nameOffset,
-            unpack("<H", data.read(2))[0],
-            unpack("<H", data.read(2))[0],
-            unpack("<H", data.read(2))[0],
-            unpack("<H", data.read(2))[0],
-            unpack("<H", data.read(2))[0],
-            unpack("<H", data.read(2))[0],
-            unpack("<H", data.read(2))[0],
-            unpack("<H", data.read(2))[0],
-        )))
-    
-    return CreateFunctions(result, StringTable)
-
-functionCache = {}
-def CreateFunctions(functions, stringTable):
+def ReadEntries(table, cls, length, start=0, count=None):
+    layout = cls.layouts[length]
+    if count is None:
+        count = table.EntryCount - start
+    data = table.Data[layout.size * start:layout.size * (start + count)]
+    return [cls(entry) for entry in layout.iter_unpack(data)]
+
+def ReadFunctions(functionTable, StringTable, length, context):
+    result = ReadEntries(functionTable, XseqFunction, length)
+    
+    return CreateFunctions(result, StringTable, context)
+
+def CreateFunctions(functions, stringTable, context):
     def CreateFunction(function, stringtable):
         name = ""
         if stringtable:
-            stringtable.Stream.seek(function.nameOffset)
-            name = read_str(stringtable.Stream)
+            name = stringtable.GetString(function.nameOffset)
             
-            functionNames = functionCache.setdefault(function.crc16, set())
+            context.AddFunctionName(function.crc16, name)
         
         return ScriptFunction((
             name,
@@ -283,37 +739,18 @@ def CreateFunctions(functions, stringTable):
     
     return result
 
-def ReadJumps(jumpTable, stringTable, length):
-    result = []
-    data = jumpTable.Stream
-    entryCount = jumpTable.EntryCount
-    
-    for i in range(entryCount):
-        if length == PointerLength.Int:
-            result.append(XseqJump((
-                unpack("<i", data.read(4))[0],
-                unpack("<H", data.read(2))[0],
-                unpack("<h", data.read(2))[0],
-            )))
-        elif length == PointerLength.Long:
-            result.append(XseqJump((
-                unpack("<l", data.read(8))[0],
-                unpack("<H", data.read(2))[0],
-                unpack("<h", data.read(2))[0],
-            )))
-            data.seek(data.tell() + 4)
-    
-    return CreateJumps(result, stringTable)
-
-jumpCache = {}
-def CreateJumps(jumps, stringTable):
+def ReadJumps(jumpTable, stringTable, length, context):
+    result = ReadEntries(jumpTable, XseqJump, length)
+    
+    return CreateJumps(result, stringTable, context)
+
+def CreateJumps(jumps, stringTable, context):
     def CreateJump(jump, stringtable):
         name = ""
         if stringtable:
-            stringtable.Stream.seek(jump.nameOffset)
-            name = read_str(stringtable.Stream)
+            name = stringtable.GetString(jump.nameOffset)
             
-            jumpNames = jumpCache.setdefault(jump.crc16, set())
+            context.AddJumpName(jump.crc16, name)
         
         return ScriptJump((
             name,
@@ -327,19 +764,7 @@ def CreateJumps(jumps, stringTable):
     return result
 
 def ReadInstructions(instructionTable, length):
-    result = []
-    data = instructionTable.Stream
-    entryCount = instructionTable.EntryCount
-    
-    for i in range(entryCount):
-        result.append(XseqInstruction((
-            unpack("<h", data.read(2))[0],
-            unpack("<h", data.read(2))[0],
-            unpack("<h", data.read(2))[0],
-            unpack("<h", data.read(2))[0],
-            unpack("<i", data.read(4))[0] if length == PointerLength.Int else \
-            unpack("<l", data.read(8))[0]
-        )))
+    result = ReadEntries(instructionTable, XseqInstruction, length)
     
     return CreateInstructions(result)
 
@@ -359,79 +784,63 @@ def CreateInstructions(instructions):
     
     return result
 
-def ReadArguments(argumentTable, instructions, stringTable, length):
-    result = []
-    data = argumentTable.Stream
-    entryCount = argumentTable.EntryCount
-    
-    for i in range(entryCount):
-        if length == PointerLength.Int:
-            result.append(XseqArgument((
-                unpack("<i", data.read(4))[0],
-                unpack("<I", data.read(4))[0],
-            )))
-        elif length == PointerLength.Long:
-            _type = unpack("<i", data.read(4))[0],
-            data.read(4)
-            value = unpack("<I", data.read(4))[0],
-            data.read(4)
-            result.append(XseqArgument((
-                _type, value
-            )))
-    
-    return CreateArguments(result, instructions, stringTable)
-
-def CreateArguments(arguments, instructions, stringTable):
+def ReadArguments(argumentTable, instructions, stringTable, length, context):
+    result = ReadEntries(argumentTable, XseqArgument, length)
+    
+    return CreateArguments(result, instructions, stringTable, context)
+
+def CreateArgumentValues(argumentType, argumentValue, instructionType, argumentIndex, stringtable, context):
+    rawType = -1
+    _type: ScriptArgumentType = None
+    value: int = None
+    
+    if argumentType == 1:
+        _type = ScriptArgumentType.Int
+        value = argumentValue
+    elif argumentType == 2:
+        _type = ScriptArgumentType.StringHash
+        value = argumentValue
+        if argumentIndex != 0:
+            names = context.FunctionNames.get(argumentValue) or context.JumpNames.get(argumentValue)
+            if names:
+                value = next(iter(names))
+        if instructionType == 20:
+            names = context.FunctionNames.get(argumentValue)
+            if names:
+                value = next(iter(names))
+        if instructionType == 30:
+            names = context.JumpNames.get(argumentValue)
+            if names:
+                value = next(iter(names))
+        if instructionType == 31:
+            names = context.JumpNames.get(argumentValue)
+            if names:
+                value = next(iter(names))
+        if instructionType == 33:
+            names = context.JumpNames.get(argumentValue)
+            if names:
+                value = next(iter(names))
+        if value == argumentValue and context.Names is not None and \
+                (argumentIndex != 0 or instructionType in (20, 30, 31, 33)):
+            value = context.Names.Get(argumentValue) or argumentValue
+    elif argumentType == 3:
+        _type = ScriptArgumentType.Float
+        value = unpack("<f", pack("<I", argumentValue))[0]
+    elif argumentType == 4:
+        _type = ScriptArgumentType.Variable
+        value = argumentValue
+    elif argumentType in (24, 25):
+        if argumentType != 24:
+            rawType = argumentType
+        _type = ScriptArgumentType.String
+        value = stringtable.GetString(argumentValue) if stringtable.Data else ""
+    
+    return rawType, _type, value
+
+def CreateArguments(arguments, instructions, stringTable, context):
     def CreateArgument(argument, instructionType, argumentIndex, stringtable):
-        rawType = -1
-        _type: ScriptArgumentType = None
-        value: int = None
-        
-        if argument.type == 1:
-            _type = ScriptArgumentType.Int
-            value = argument.value
-        elif argument.type == 2:
-            _type = ScriptArgumentType.StringHash
-            value = argument.value
-            if argumentIndex != 0:
-                names = functionCache.get(argument.value) or jumpCache.get(argument.value)
-                if names:
-                    value = next(iter(names))
-            if instructionType == 20:
-                names = functionCache.get(argument.value)
-                if names:
-                    value = next(iter(names))
-            if instructionType == 30:
-                names = jumpCache.get(argument.value)
-                if names:
-                    value = next(iter(names))
-            if instructionType == 31:
-                names = jumpCache.get(argument.value)
-                if names:
-                    value = next(iter(names))
-            if instructionType == 33:
-                names = jumpCache.get(argument.value)
-                if names:
-                    value = next(iter(names))
-        elif argument.type == 3:
-            _type = ScriptArgumentType.Float
-            value = unpack("<f", pack("<I", argument.value))[0]
-        elif argument.type == 4:
-            _type = ScriptArgumentType.Variable
-            value = argument.value
-        elif argument.type in (24, 25):
-            if stringtable.Stream:
-                stringtable.Stream.seek(argument.value)
-            if argument.type != 24:
-                rawType = argument.type
-            _type = ScriptArgumentType.String
-            value = read_str(stringtable.Stream) if stringtable.Stream else ""
-        
-        return ScriptArgument((
-            rawType,
-            _type,
-            value,
-        ))
+        return ScriptArgument(CreateArgumentValues(
+            argument.type, argument.value, instructionType, argumentIndex, stringtable, context))
     
     result = [ScriptArgument] * len(arguments)
     
@@ -446,38 +855,19 @@ def CreateArguments(arguments, instructions, stringTable):
     
     return result
 
-def read_str(data):
-    text = b""
-    while True:
-        char = unpack("<1s", data.read(1))[0]
-        if char == b"\x00":
-            break
-        text += char
-    return text.decode("shift-jis")
-
+VariablePrefixes = ("unk", "local", "object", "param", "global")
+PlainValueTypes = (ScriptArgumentType.Int, ScriptArgumentType.StringHash, ScriptArgumentType.Float)
 
 def CreateValueExpression(value, argumentType, rawArgumentType = -1):
-    output = ""
     if argumentType == ScriptArgumentType.Variable:
-        if value >= 0 and value <= 999:
-            output += f"unk{value}"
-        elif value >= 1000 and value <= 1999:
-            output += f"local{value - 1000}"
-        elif value >= 2000 and value <= 2999:
-            output += f"object{value - 2000}"
-        elif value >= 3000 and value <= 3999:
-            output += f"param{value - 3000}"
-        elif value >= 4000 and value <= 4999:
-            output += f"global{value - 4000}"
+        # unk0-999, local1000-1999, object2000-2999, param3000-3999, global4000-4999
+        output = f"{VariablePrefixes[value // 1000]}{value % 1000}" if 0 <= value <= 4999 else ""
+    elif argumentType == ScriptArgumentType.String:
+        output = f'"{value}"'
+    elif argumentType in PlainValueTypes:
+        output = f"{value}"
     else:
-        if argumentType == ScriptArgumentType.Int:
-            output += f"{value}"
-        elif argumentType == ScriptArgumentType.StringHash:
-            output += f"{value}"
-        elif argumentType == ScriptArgumentType.Float:
-            output += f"{value}"
-        elif argumentType == ScriptArgumentType.String:
-            output += f'"{value}"'
+        output = ""
     
     if rawArgumentType >= 0:
         output += f"<{rawArgumentType}>"
@@ -485,7 +875,7 @@ def CreateValueExpression(value, argumentType, rawArgumentType = -1):
     return output
 
 def CreateArrayIndexExpression(arrayVariable, indexes):
-    if type(arrayVariable) == ScriptArgument:
+    if not isinstance(arrayVariable, str):
         arrayVariable = CreateValueExpression(arrayVariable.Value, arrayVariable.Type, arrayVariable.RawArgumentType)
     
     output = arrayVariable
@@ -499,198 +889,155 @@ def CreateGotoStatement(instruction, script):
     output = f"goto {CreateValueExpression(argument.Value, argument.Type, argument.RawArgumentType)}"
     return output
 
-def to_txt(filepath, script):
-    out = open(filepath, "wt")
-    
-    t = 0 # indentation level
-    
-    for function in script.Functions:
-        #function = script.Functions[7]
-        # function declaration
-        out.write(f"def {function.Name}(")
-        # function params
-        for i in range(function.ParameterCount):
-            out.write(f"param{i}")
-            out.write(", ") if i != function.ParameterCount -1 else 0
-        out.write("):\n")
-
-        # body function
-        t = 1
-
-        jumpLookup = {}
-        jumps = script.Jumps[function.JumpIndex:function.JumpIndex + function.JumpCount]
-        for jump in jumps:
-            jumpLookup[jump.InstructionIndex] = []
-        for jump in jumps:
-            jumpLookup[jump.InstructionIndex].append(jump)
-        if function.InstructionCount != 0:
-            for i in range(function.InstructionIndex, function.InstructionIndex + function.InstructionCount):
-                instruction = script.Instructions[i]
-
-                if jumpLookup.get(i):
-                    for jump in jumpLookup[i]:
-                        out.write(f'"{jump.Name}":\n')
-
-                if instruction.Type == 10:
-                    out.write("\t" * t + "yield\n")
-                elif instruction.Type == 11:
-                    out.write("\t" * t + "return ")
-                    if instruction.ArgumentCount > 0:
-                        argument = script.Arguments[instruction.ArgumentIndex]
-                        out.write(f"{CreateValueExpression(argument.Value, argument.Type, argument.RawArgumentType)}\n")
-                    else:
-                        out.write("\n")
-                elif instruction.Type == 12:
-                    out.write("\t" * t + "exit()\n")
-                elif instruction.Type in (30, 33):
-                    out.write("\t" * t + "if ")
-                    if instruction.Type == 33:
-                        out.write("not ")
-                    argument = script.Arguments[instruction.ArgumentIndex + 1]
-                    out.write(f"{CreateValueExpression(argument.Value, argument.Type, argument.RawArgumentType)}")
-                    out.write(f" {CreateGotoStatement(instruction, script)}\n")
-                elif instruction.Type == 31:
-                    out.write("\t" * t + f"{CreateGotoStatement(instruction, script)}\n")
-                elif instruction.Type in (240, 241):
-                    returnValue = CreateValueExpression(instruction.ReturnParameter, ScriptArgumentType.Variable)
-                    value = returnValue
-                    if instruction.ArgumentCount > 0:
-                        value = CreateArrayIndexExpression(
-                            returnValue, script.Arguments[instruction.ArgumentIndex:instruction.ArgumentIndex + instruction.ArgumentCount])
-                    out.write("\t" * t + f"{value}")
-                    if instruction.Type == 240:
-                        out.write("++\n")
-                    elif instruction.Type == 241:
-                        out.write("--\n")
-                else:
-                    leftValue = CreateValueExpression(instruction.ReturnParameter, ScriptArgumentType.Variable)
-                    left = leftValue
-                    if instruction.Type in (100, 250, 251, 252, 253, 254, 260, 261, 262, 270, 271):
-                        if instruction.ArgumentCount > 1:
-                            indexes3 = script.Arguments[
-                                instruction.ArgumentIndex + 1:(instruction.ArgumentIndex + 1) + instruction.ArgumentCount - 1]
-                            left = CreateArrayIndexExpression(leftValue, indexes3)
-                    right = ""
-                    equalsOperator = "="
-                    argument = script.Arguments[instruction.ArgumentIndex]
-                    if instruction.Type == 100:
-                        right = CreateValueExpression(argument.Value, argument.Type, argument.RawArgumentType)
-                    elif instruction.Type in (110, 112, 120):
-                        value = CreateValueExpression(argument.Value, argument.Type, argument.RawArgumentType)
-                        if instruction.Type == 110:
-                            right = f"~{value}"
-                        elif instruction.Type == 112:
-                            right = f"-{value}"
-                        elif instruction.Type == 120:
-                            right = f"not {value}"
-                    elif instruction.Type in (121, 122):
-                        argument1 = script.Arguments[instruction.ArgumentIndex + 1]
-                        lleft = CreateValueExpression(argument.Value, argument.Type, argument.RawArgumentType)
-                        rright = CreateValueExpression(argument1.Value, argument1.Type, argument1.RawArgumentType)
-                        if instruction.Type == 121:
-                            right = f"{lleft} and {rright}"
-                        elif instruction.Type == 122:
-                            right = f"{lleft} or {rright}"
-                    elif instruction.Type in (130, 131, 132, 133, 134, 135, 140, 141, 150, 151, 152, 153, 154, 160, 161, 162, 170, 171):
-                        lleft = CreateValueExpression(argument.Value, argument.Type, argument.RawArgumentType)
-                        if instruction.Type == 140:
-                            right = f"{lleft} + {CreateValueExpression(1, ScriptArgumentType.Int)}"
-                        elif instruction.Type == 141:
-                            right = f"{lleft} - {CreateValueExpression(1, ScriptArgumentType.Int)}"
-                        argument1 = script.Arguments[instruction.ArgumentIndex + 1]
-                        rright = CreateValueExpression(argument1.Value, argument1.Type, argument1.RawArgumentType)
-                        if instruction.Type == 130:
-                            right = f"{lleft} == {rright}"
-                        elif instruction.Type == 131:
-                            right = f"{lleft} != {rright}"
-                        elif instruction.Type == 132:
-                            right = f"{lleft} >= {rright}"
-                        elif instruction.Type == 133:
-                            right = f"{lleft} <= {rright}"
-                        elif instruction.Type == 134:
-                            right = f"{lleft} > {rright}"
-                        elif instruction.Type == 135:
-                            right = f"{lleft} < {rright}"
-                        elif instruction.Type == 150:
-                            right = f"{lleft} + {rright}"
-                        elif instruction.Type == 151:
-                            right = f"{lleft} - {rright}"
-                        elif instruction.Type == 152:
-                            right = f"{lleft} * {rright}"
-                        elif instruction.Type == 153:
-                            right = f"{lleft} / {rright}"
-                        elif instruction.Type == 154:
-                            right = f"{lleft} % {rright}"
-                        elif instruction.Type == 160:
-                            right = f"{lleft} & {rright}"
-                        elif instruction.Type == 161:
-                            right = f"{lleft} | {rright}"
-                        elif instruction.Type == 162:
-                            right = f"{lleft} ^ {rright}"
-                        elif instruction.Type == 170:
-                            right = f"{lleft} << {rright}"
-                        elif instruction.Type == 171:
-                            right = f"{lleft} >> {rright}"
-                    elif instruction.Type == 250:
-                        equalsOperator = "+="
-                        right = CreateValueExpression(argument.Value, argument.Type, argument.RawArgumentType)
-                    elif instruction.Type == 251:
-                        equalsOperator = "-="
-                        right = CreateValueExpression(argument.Value, argument.Type, argument.RawArgumentType)
-                    elif instruction.Type == 252:
-                        equalsOperator = "*="
-                        right = CreateValueExpression(argument.Value, argument.Type, argument.RawArgumentType)
-                    elif instruction.Type == 253:
-                        equalsOperator = "/="
-                        right = CreateValueExpression(argument.Value, argument.Type, argument.RawArgumentType)
-                    elif instruction.Type == 254:
-                        equalsOperator = "%="
-                        right = CreateValueExpression(argument.Value, argument.Type, argument.RawArgumentType)
-                    elif instruction.Type == 260:
-                        equalsOperator = "&="
-                        right = CreateValueExpression(argument.Value, argument.Type, argument.RawArgumentType)
-                    elif instruction.Type == 261:
-                        equalsOperator = "|="
-                        right = CreateValueExpression(argument.Value, argument.Type, argument.RawArgumentType)
-                    elif instruction.Type == 262:
-                        equalsOperator = "^="
-                        right = CreateValueExpression(argument.Value, argument.Type, argument.RawArgumentType)
-                    elif instruction.Type == 270:
-                        equalsOperator = "<<="
-                        right = CreateValueExpression(argument.Value, argument.Type, argument.RawArgumentType)
-                    elif instruction.Type == 271:
-                        equalsOperator = ">>="
-                        right = CreateValueExpression(argument.Value, argument.Type, argument.RawArgumentType)
-                    elif instruction.Type in (511, 512, 513):
-                        print("OH MY GOD A CAST VALUE EXPRESSION")
-                        pass
-                        #castValue = CreateValueExpression(argument.Value, argument.Type, argument.RawArgumentType)
-                    elif instruction.Type == 523:
-                        print("OH MY GOD A SWITCH STATEMENT")
-                        pass
-                    elif instruction.Type == 530:
-                        print("OH MY GOD A 'new' KEYWORD")
-                        pass
-                    elif instruction.Type == 531:
-                        indexes = script.Arguments[
-                                instruction.ArgumentIndex + 1:(instruction.ArgumentIndex + 1) + instruction.ArgumentCount - 1]
-                        right = CreateArrayIndexExpression(argument, indexes)
-                    else: # Function calls (WIP)
-                        pass
-                        #identifier = ""
-                        #if not (instruction.Type != 20 or instruction.ArgumentCount <= 0):
-                        #    identifier = str(script.Arguments[instruction.ArgumentIndex].Value)
-                    out.write("\t" * t + f"{left} {equalsOperator} {right}\n")
-
-            instructionEndIndex = function.InstructionIndex + function.InstructionCount
-            if jumpLookup.get(instructionEndIndex):
-                for jump in jumpLookup[instructionEndIndex]:
-                    out.write(f'"{jump.Name}":\n')
-
-            out.write("\n")
-    
-    out.close()
-
-with open("./filepath.xq", "rb") as file:
-    script = open_xseq(BytesIO(file.read()))
-    to_txt("./filepath.txt", script)
+def CreateArgumentExpression(argument):
+    return CreateValueExpression(argument.Value, argument.Type, argument.RawArgumentType)
+
+def FormatReturn(instruction, arguments):
+    if instruction.ArgumentCount > 0:
+        return f"\treturn {CreateArgumentExpression(arguments[instruction.ArgumentIndex])}\n"
+    return "\treturn \n"
+
+def FormatConditionalGoto(negate):
+    prefix = "\tif not " if negate else "\tif "
+    def Format(instruction, arguments):
+        condition = CreateArgumentExpression(arguments[instruction.ArgumentIndex + 1])
+        target = CreateArgumentExpression(arguments[instruction.ArgumentIndex])
+        return f"{prefix}{condition} goto {target}\n"
+    return Format
+
+def FormatGoto(instruction, arguments):
+    return f"\tgoto {CreateArgumentExpression(arguments[instruction.ArgumentIndex])}\n"
+
+def FormatIncrement(suffix):
+    def Format(instruction, arguments):
+        value = CreateValueExpression(instruction.ReturnParameter, ScriptArgumentType.Variable)
+        if instruction.ArgumentCount > 0:
+            value = CreateArrayIndexExpression(
+                value, arguments[instruction.ArgumentIndex:instruction.ArgumentIndex + instruction.ArgumentCount])
+        return f"\t{value}{suffix}\n"
+    return Format
+
+def CreateAssignmentTarget(instruction, arguments, indexed):
+    left = CreateValueExpression(instruction.ReturnParameter, ScriptArgumentType.Variable)
+    if indexed and instruction.ArgumentCount > 1:
+        left = CreateArrayIndexExpression(
+            left, arguments[instruction.ArgumentIndex + 1:instruction.ArgumentIndex + instruction.ArgumentCount])
+    return left
+
+def FormatAssignment(operator="=", indexed=False):
+    def Format(instruction, arguments):
+        left = CreateAssignmentTarget(instruction, arguments, indexed)
+        right = CreateArgumentExpression(arguments[instruction.ArgumentIndex])
+        return f"\t{left} {operator} {right}\n"
+    return Format
+
+def FormatUnary(operator):
+    def Format(instruction, arguments):
+        left = CreateAssignmentTarget(instruction, arguments, False)
+        right = CreateArgumentExpression(arguments[instruction.ArgumentIndex])
+        return f"\t{left} = {operator}{right}\n"
+    return Format
+
+def FormatBinary(operator):
+    def Format(instruction, arguments):
+        left = CreateAssignmentTarget(instruction, arguments, False)
+        lleft = CreateArgumentExpression(arguments[instruction.ArgumentIndex])
+        rright = CreateArgumentExpression(arguments[instruction.ArgumentIndex + 1])
+        return f"\t{left} = {lleft} {operator} {rright}\n"
+    return Format
+
+def FormatStep(operator):
+    def Format(instruction, arguments):
+        left = CreateAssignmentTarget(instruction, arguments, False)
+        lleft = CreateArgumentExpression(arguments[instruction.ArgumentIndex])
+        return f"\t{left} = {lleft} {operator} {CreateValueExpression(1, ScriptArgumentType.Int)}\n"
+    return Format
+
+def FormatArrayIndex(instruction, arguments):
+    left = CreateAssignmentTarget(instruction, arguments, False)
+    right = CreateArrayIndexExpression(
+        arguments[instruction.ArgumentIndex],
+        arguments[instruction.ArgumentIndex + 1:instruction.ArgumentIndex + instruction.ArgumentCount])
+    return f"\t{left} = {right}\n"
+
+def FormatUnsupported(message):
+    def Format(instruction, arguments):
+        # Rendered as a call; the warning goes to stderr, not the output.
+        warnings.warn(f"{message} (instruction type {instruction.Type}) is rendered as a call", stacklevel=2)
+        return FormatCall(instruction, arguments)
+    return Format
+
+def FormatCall(instruction, arguments):
+    # Function calls (WIP)
+    left = CreateAssignmentTarget(instruction, arguments, False)
+    return f"\t{left} = \n"
+
+InstructionFormatters = {
+    10: lambda instruction, arguments: "\tyield\n",
+    11: FormatReturn,
+    12: lambda instruction, arguments: "\texit()\n",
+    30: FormatConditionalGoto(False),
+    31: FormatGoto,
+    33: FormatConditionalGoto(True),
+    100: FormatAssignment("=", indexed=True),
+    110: FormatUnary("~"),
+    112: FormatUnary("-"),
+    120: FormatUnary("not "),
+    121: FormatBinary("and"),
+    122: FormatBinary("or"),
+    140: FormatStep("+"),
+    141: FormatStep("-"),
+    240: FormatIncrement("++"),
+    241: FormatIncrement("--"),
+    511: FormatUnsupported("Cast value expression"),
+    512: FormatUnsupported("Cast value expression"),
+    513: FormatUnsupported("Cast value expression"),
+    523: FormatUnsupported("Switch statement"),
+    530: FormatUnsupported("'new' keyword"),
+    531: FormatArrayIndex,
+}
+for instructionType, operator in (
+        (130, "=="), (131, "!="), (132, ">="), (133, "<="), (134, ">"), (135, "<"),
+        (150, "+"), (151, "-"), (152, "*"), (153, "/"), (154, "%"),
+        (160, "&"), (161, "|"), (162, "^"), (170, "<<"), (171, ">>")):
+    InstructionFormatters[instructionType] = FormatBinary(operator)
+for instructionType, operator in (
+        (250, "+="), (251, "-="), (252, "*="), (253, "/="), (254, "%="),
+        (260, "&="), (261, "|="), (262, "^="), (270, "<<="), (271, ">>=")):
+    InstructionFormatters[instructionType] = FormatAssignment(operator, indexed=True)
+
+def to_txt(filepath, script, stats=None):
+    start = perf_counter()
+    written = 0
+    instructions = script.Instructions
+    arguments = script.Arguments
+    formatters = InstructionFormatters
+    
+    with open(filepath, "wt") as out:
+        for function in script.Functions:
+            # function declaration
+            params = ", ".join(f"param{i}" for i in range(function.ParameterCount))
+            lines = [f"def {function.Name}({params}):\n"]
+            
+            if function.InstructionCount != 0:
+                jumpLookup = {}
+                for jump in script.Jumps[function.JumpIndex:function.JumpIndex + function.JumpCount]:
+                    jumpLookup.setdefault(jump.InstructionIndex, []).append(f'"{jump.Name}":\n')
+                
+                instructionEndIndex = function.InstructionIndex + function.InstructionCount
+                for i in range(function.InstructionIndex, instructionEndIndex):
+                    instruction = instructions[i]
+                    labels = jumpLookup.get(i)
+                    if labels:
+                        lines.extend(labels)
+                    lines.append(formatters.get(instruction.Type, FormatCall)(instruction, arguments))
+                
+                labels = jumpLookup.get(instructionEndIndex)
+                if labels:
+                    lines.extend(labels)
+                lines.append("\n")
+            
+            written += out.write("".join(lines))
+    
+    if stats is not None:
+        stats.Record("render", "text", perf_counter() - start, 0, written, len(instructions))
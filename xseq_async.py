@@ -0,0 +1,115 @@
+import asyncio
+import inspect
+import os
+from functools import partial
+
+from xseq import open_xseq, open_xseq_path
+
+async def ReadSource(source):
+    """Return the bytes of an in-memory or streamed source, or None for a path."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return source
+    if isinstance(source, (str, os.PathLike)):
+        return None
+    if hasattr(source, "read"):
+        # asyncio.StreamReader and async file objects read to EOF by default.
+        data = source.read()
+        return await data if inspect.isawaitable(data) else data
+    if hasattr(source, "__aiter__"):
+        return b"".join([chunk async for chunk in source])
+    raise TypeError(f"Unsupported script source: {type(source).__name__}.")
+
+async def open_xseq_async(source, executor=None, context=None):
+    """
+    Parse a script without blocking the event loop. `source` is bytes, a
+    path, a stream with read() (sync or async) or an async iterator of
+    chunks. Reading happens on the loop, parsing on `executor` (the loop's
+    default thread pool if None). With a ProcessPoolExecutor the result is
+    pickled back, and `context` must be None.
+    """
+    loop = asyncio.get_running_loop()
+    data = await ReadSource(source)
+    if data is None:
+        # Paths are mapped and parsed inside the executor.
+        return await loop.run_in_executor(executor, partial(open_xseq_path, os.fspath(source), context=context))
+    if isinstance(data, memoryview):
+        data = bytes(data)
+    return await loop.run_in_executor(executor, partial(open_xseq, data, context=context))
+
+async def IterateSources(sources):
+    if hasattr(sources, "__aiter__"):
+        async for source in sources:
+            yield source
+    else:
+        for source in sources:
+            yield source
+
+async def decompile_stream(sources, executor=None, limit=None, return_exceptions=False):
+    """
+    Yield (source, ScriptFile) for every source as soon as it is parsed,
+    in completion order. `sources` may be an iterable or async iterable.
+
+    At most `limit` sources are read, parsed or waiting to be consumed at
+    any time; the next source is not pulled until the consumer has taken a
+    result, so a slow consumer holds back reading instead of buffering.
+    A failed source raises, or with `return_exceptions` is yielded as
+    (source, exception).
+    """
+    limit = limit or os.cpu_count() or 4
+    slots = asyncio.Semaphore(limit)
+    results = asyncio.Queue()
+    done = object()
+
+    async def Parse(source):
+        try:
+            script = await open_xseq_async(source, executor)
+        except Exception as e:
+            results.put_nowait((source, None, e))
+        else:
+            results.put_nowait((source, script, None))
+
+    async def Produce():
+        tasks = set()
+        try:
+            iterator = IterateSources(sources).__aiter__()
+            while True:
+                # Take a slot before pulling, so no source is read early.
+                await slots.acquire()
+                try:
+                    source = await iterator.__anext__()
+                except StopAsyncIteration:
+                    break
+                task = asyncio.create_task(Parse(source))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        finally:
+            results.put_nowait(done)
+
+    producer = asyncio.create_task(Produce())
+    try:
+        while True:
+            item = await results.get()
+            if item is done:
+                break
+            slots.release()
+            source, script, error = item
+            if error is None:
+                yield source, script
+            elif return_exceptions:
+                yield source, error
+            else:
+                raise error
+        # Re-raises an error from iterating the sources themselves.
+        await producer
+    finally:
+        if not producer.done():
+            producer.cancel()
+            try:
+                await producer
+            except asyncio.CancelledError:
+                pass
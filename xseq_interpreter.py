@@ -0,0 +1,455 @@
+import operator
+
+from namehash import Crc16, Crc32
+from xseq import ScriptArgumentType
+
+# Frames are lists of variable spaces, indexed by `value // 1000` of a
+# Variable argument (unk, local, object, param, global), followed by the
+# function's constants and a scratch slot for results nobody reads.
+Unk, Local, Object, Param, Global, Constant, Scratch = range(7)
+SpaceCount = 7
+MaxDepth = 200
+
+class ScriptError(Exception):
+    pass
+
+class StepLimitError(ScriptError):
+    pass
+
+class ScriptExit(Exception):
+    # Raised by exit() and caught by Interpreter.Run.
+    pass
+
+def Divide(left, right):
+    # Integer division truncates towards zero, as in C.
+    if isinstance(left, int) and isinstance(right, int):
+        quotient = abs(left) // abs(right)
+        return -quotient if (left < 0) != (right < 0) else quotient
+    return left / right
+
+def Modulo(left, right):
+    if isinstance(left, int) and isinstance(right, int):
+        return left - right * Divide(left, right)
+    return left % right
+
+BinaryOperations = {
+    121: lambda left, right: bool(left) and bool(right),
+    122: lambda left, right: bool(left) or bool(right),
+    130: operator.eq, 131: operator.ne, 132: operator.ge, 133: operator.le, 134: operator.gt, 135: operator.lt,
+    150: operator.add, 151: operator.sub, 152: operator.mul, 153: Divide, 154: Modulo,
+    160: operator.and_, 161: operator.or_, 162: operator.xor, 170: operator.lshift, 171: operator.rshift,
+}
+UnaryOperations = {
+    110: operator.invert,
+    112: operator.neg,
+    120: operator.not_,
+    140: lambda value: value + 1,
+    141: lambda value: value - 1,
+}
+# Compound assignments, `ret op= arg0`, and their binary operation.
+CompoundOperations = {
+    250: 150, 251: 151, 252: 152, 253: 153, 254: 154,
+    260: 160, 261: 161, 262: 162, 270: 170, 271: 171,
+}
+
+def GetIndexed(container, indexes):
+    for index in indexes:
+        container = container.get(index, 0) if isinstance(container, dict) else 0
+    return container
+
+def SetIndexed(container, indexes, value):
+    # Arrays are dicts, created on first store; missing elements read as 0.
+    if not isinstance(container, dict):
+        container = {}
+    inner = container
+    for index in indexes[:-1]:
+        child = inner.get(index)
+        if not isinstance(child, dict):
+            child = inner[index] = {}
+        inner = child
+    inner[indexes[-1]] = value
+    return container
+
+class CompiledFunction:
+    def __init__(self, data):
+        self.Name, \
+        self.Index, \
+        self.ParameterCount, \
+        self.Code, \
+        self.Constants, \
+        self.Sizes = data
+
+class FunctionCompiler:
+    """
+    Turns the instructions of one function into a list of closures, one
+    per instruction, each taking the frame and returning the next pc.
+    Operands are resolved to (space, index) pairs and goto targets to
+    pcs up front, so running an instruction does no decoding at all.
+    """
+
+    def __init__(self, interpreter, function, jumps):
+        self.Interpreter = interpreter
+        self.Function = function
+        self.Start = function.InstructionIndex
+        self.End = function.InstructionIndex + function.InstructionCount
+        self.Constants = []
+        self.ConstantSlots = {}
+        self.Sizes = [0] * SpaceCount
+        self.Sizes[Local] = function.LocalCount
+        self.Sizes[Object] = function.ObjectCount
+        self.Sizes[Param] = function.ParameterCount
+        self.Labels = {}
+        for jump in jumps:
+            for key in (jump.Name, *NameKeys(jump.Name)):
+                self.Labels.setdefault(key, jump.InstructionIndex - self.Start)
+
+    def Variable(self, value):
+        if not 0 <= value <= 4999:
+            return Scratch, 0
+        space, index = divmod(value, 1000)
+        self.Sizes[space] = max(self.Sizes[space], index + 1)
+        return space, index
+
+    def Constant(self, value):
+        key = (type(value), value)
+        slot = self.ConstantSlots.get(key)
+        if slot is None:
+            slot = self.ConstantSlots[key] = len(self.Constants)
+            self.Constants.append(value)
+        return Constant, slot
+
+    def Operand(self, argument):
+        if argument.Type == ScriptArgumentType.Variable:
+            return self.Variable(argument.Value)
+        return self.Constant(argument.Value)
+
+    def Operands(self, instruction, start=0, count=None):
+        arguments = self.Interpreter.Script.Arguments
+        end = instruction.ArgumentCount if count is None else start + count
+        return [self.Operand(arguments[instruction.ArgumentIndex + i]) if i < instruction.ArgumentCount
+                else self.Constant(None) for i in range(start, end)]
+
+    def Target(self, instruction):
+        arguments = self.Interpreter.Script.Arguments
+        if instruction.ArgumentCount == 0:
+            return None
+        target = self.Labels.get(arguments[instruction.ArgumentIndex].Value)
+        if target is None or not 0 <= target <= self.End - self.Start:
+            return None
+        return target
+
+    def Compile(self):
+        instructions = self.Interpreter.Script.Instructions
+        code = []
+        for pc in range(self.End - self.Start):
+            instruction = instructions[self.Start + pc]
+            compile = Compilers.get(instruction.Type, CompileNative)
+            code.append(compile(self, instruction, pc))
+
+        function = self.Function
+        return CompiledFunction((function.Name, None, function.ParameterCount, code, self.Constants, self.Sizes))
+
+def NameKeys(name):
+    if not isinstance(name, str):
+        return ()
+    try:
+        data = name.encode("shift-jis")
+    except UnicodeEncodeError:
+        return ()
+    return Crc16(data), Crc32(data)
+
+# Compilers take (compiler, instruction, pc) and return the instruction's
+# closure: frame -> next pc. A pc past the end of the code returns.
+def CompileYield(compiler, instruction, pc):
+    interpreter = compiler.Interpreter
+    nextPc = pc + 1
+    def Run(frame):
+        interpreter.Yields += 1
+        if interpreter.OnYield is not None:
+            interpreter.OnYield(interpreter, frame)
+        return nextPc
+    return Run
+
+def CompileReturn(compiler, instruction, pc):
+    if instruction.ArgumentCount == 0:
+        value = compiler.Constant(None)
+    else:
+        value = compiler.Operand(compiler.Interpreter.Script.Arguments[instruction.ArgumentIndex])
+    space, index = value
+    def Run(frame):
+        frame[Scratch][1] = frame[space][index]
+        return Returned
+    return Run
+
+def CompileExit(compiler, instruction, pc):
+    def Run(frame):
+        raise ScriptExit()
+    return Run
+
+def CompileGoto(compiler, instruction, pc):
+    target = compiler.Target(instruction)
+    if target is None:
+        return CompileBadTarget(compiler, instruction)
+    def Run(frame):
+        return target
+    return Run
+
+def CompileConditionalGoto(negate):
+    def Compile(compiler, instruction, pc):
+        target = compiler.Target(instruction)
+        if target is None:
+            return CompileBadTarget(compiler, instruction)
+        (space, index), = compiler.Operands(instruction, 1, 1)
+        nextPc = pc + 1
+        if negate:
+            def Run(frame):
+                return nextPc if frame[space][index] else target
+        else:
+            def Run(frame):
+                return target if frame[space][index] else nextPc
+        return Run
+    return Compile
+
+def CompileBadTarget(compiler, instruction):
+    arguments = compiler.Interpreter.Script.Arguments
+    label = arguments[instruction.ArgumentIndex].Value if instruction.ArgumentCount else None
+    def Run(frame):
+        raise ScriptError(f"goto to unknown label {label!r}")
+    return Run
+
+def CompileAssignment(compiler, instruction, pc):
+    (valueSpace, valueIndex), *indexes = compiler.Operands(instruction)
+    targetSpace, targetIndex = compiler.Variable(instruction.ReturnParameter)
+    nextPc = pc + 1
+    if indexes:
+        def Run(frame):
+            target = frame[targetSpace]
+            target[targetIndex] = SetIndexed(target[targetIndex], [frame[s][i] for s, i in indexes],
+                                             frame[valueSpace][valueIndex])
+            return nextPc
+    else:
+        def Run(frame):
+            frame[targetSpace][targetIndex] = frame[valueSpace][valueIndex]
+            return nextPc
+    return Run
+
+def CompileUnary(compiler, instruction, pc):
+    operation = UnaryOperations[instruction.Type]
+    (space, index), = compiler.Operands(instruction, 0, 1)
+    targetSpace, targetIndex = compiler.Variable(instruction.ReturnParameter)
+    nextPc = pc + 1
+    def Run(frame):
+        frame[targetSpace][targetIndex] = operation(frame[space][index])
+        return nextPc
+    return Run
+
+def CompileBinary(compiler, instruction, pc):
+    operation = BinaryOperations[instruction.Type]
+    (leftSpace, leftIndex), (rightSpace, rightIndex) = compiler.Operands(instruction, 0, 2)
+    targetSpace, targetIndex = compiler.Variable(instruction.ReturnParameter)
+    nextPc = pc + 1
+    def Run(frame):
+        frame[targetSpace][targetIndex] = operation(frame[leftSpace][leftIndex], frame[rightSpace][rightIndex])
+        return nextPc
+    return Run
+
+def CompileCompound(compiler, instruction, pc):
+    operation = BinaryOperations[CompoundOperations[instruction.Type]]
+    (valueSpace, valueIndex), *indexes = compiler.Operands(instruction)
+    targetSpace, targetIndex = compiler.Variable(instruction.ReturnParameter)
+    nextPc = pc + 1
+    if indexes:
+        def Run(frame):
+            target = frame[targetSpace]
+            keys = [frame[s][i] for s, i in indexes]
+            value = operation(GetIndexed(target[targetIndex], keys), frame[valueSpace][valueIndex])
+            target[targetIndex] = SetIndexed(target[targetIndex], keys, value)
+            return nextPc
+    else:
+        def Run(frame):
+            target = frame[targetSpace]
+            target[targetIndex] = operation(target[targetIndex], frame[valueSpace][valueIndex])
+            return nextPc
+    return Run
+
+def CompileIncrement(compiler, instruction, pc):
+    step = 1 if instruction.Type == 240 else -1
+    indexes = compiler.Operands(instruction)
+    targetSpace, targetIndex = compiler.Variable(instruction.ReturnParameter)
+    nextPc = pc + 1
+    if indexes:
+        def Run(frame):
+            target = frame[targetSpace]
+            keys = [frame[s][i] for s, i in indexes]
+            target[targetIndex] = SetIndexed(target[targetIndex], keys, GetIndexed(target[targetIndex], keys) + step)
+            return nextPc
+    else:
+        def Run(frame):
+            target = frame[targetSpace]
+            target[targetIndex] += step
+            return nextPc
+    return Run
+
+def CompileArrayIndex(compiler, instruction, pc):
+    (arraySpace, arrayIndex), *indexes = compiler.Operands(instruction, 0, max(instruction.ArgumentCount, 1))
+    targetSpace, targetIndex = compiler.Variable(instruction.ReturnParameter)
+    nextPc = pc + 1
+    def Run(frame):
+        frame[targetSpace][targetIndex] = GetIndexed(frame[arraySpace][arrayIndex], [frame[s][i] for s, i in indexes])
+        return nextPc
+    return Run
+
+def CompileCall(compiler, instruction, pc):
+    interpreter = compiler.Interpreter
+    arguments = interpreter.Script.Arguments
+    if instruction.ArgumentCount == 0:
+        return CompileNative(compiler, instruction, pc)
+    name = arguments[instruction.ArgumentIndex].Value
+    callee = interpreter.FunctionIndex.get(name)
+    if callee is None:
+        return CompileNative(compiler, instruction, pc, name, 1)
+
+    parameters = compiler.Operands(instruction, 1)
+    targetSpace, targetIndex = compiler.Variable(instruction.ReturnParameter)
+    invoke = interpreter.Invoke
+    nextPc = pc + 1
+    def Run(frame):
+        frame[targetSpace][targetIndex] = invoke(callee, [frame[s][i] for s, i in parameters])
+        return nextPc
+    return Run
+
+def CompileNative(compiler, instruction, pc, name=None, start=0):
+    # Instructions with no built-in meaning, and calls to functions outside
+    # the script, go to a hook keyed by the callee name or instruction type.
+    interpreter = compiler.Interpreter
+    key = instruction.Type if name is None else name
+    hook = interpreter.Natives.get(key, interpreter.Default)
+    parameters = compiler.Operands(instruction, start)
+    targetSpace, targetIndex = compiler.Variable(instruction.ReturnParameter)
+    nextPc = pc + 1
+    if hook is None:
+        def Run(frame):
+            raise ScriptError(f"no native hook for {key!r}")
+        return Run
+    def Run(frame):
+        frame[targetSpace][targetIndex] = hook(interpreter, key, [frame[s][i] for s, i in parameters])
+        return nextPc
+    return Run
+
+Compilers = {
+    10: CompileYield,
+    11: CompileReturn,
+    12: CompileExit,
+    20: CompileCall,
+    30: CompileConditionalGoto(False),
+    31: CompileGoto,
+    33: CompileConditionalGoto(True),
+    100: CompileAssignment,
+    240: CompileIncrement,
+    241: CompileIncrement,
+    531: CompileArrayIndex,
+}
+for instructionType in UnaryOperations:
+    Compilers[instructionType] = CompileUnary
+for instructionType in BinaryOperations:
+    Compilers[instructionType] = CompileBinary
+for instructionType in CompoundOperations:
+    Compilers[instructionType] = CompileCompound
+
+# Returned by `return`: past the end of any function, so the loop stops.
+Returned = 1 << 30
+
+class Interpreter:
+    """
+    Runs the functions of a ScriptFile. Every function is compiled once,
+    up front; Run(name, *params) calls one and returns its return value.
+
+    `natives` maps callee names (for calls to functions the script does
+    not define) and instruction types (for opcodes with no built-in
+    meaning) to hooks, called as hook(interpreter, key, arguments) and
+    returning the result; `default` is used for any other key, and
+    without one they raise ScriptError. `onYield(interpreter, frame)` is
+    called at every yield. Globals persist across runs. With `maxSteps`,
+    runs stop with StepLimitError after about that many instructions.
+    """
+
+    def __init__(self, script, natives=None, default=None, onYield=None, maxSteps=None):
+        self.Script = script
+        self.Natives = natives or {}
+        self.Default = default
+        self.OnYield = onYield
+        self.MaxSteps = maxSteps
+        self.Steps = 0
+        self.Yields = 0
+        self.Depth = 0
+        self.Exited = False
+
+        self.FunctionIndex = {}
+        functions = list(script.Functions)
+        self.Functions = [None] * len(functions)
+        for i, function in enumerate(functions):
+            for key in (function.Name, *NameKeys(function.Name)):
+                self.FunctionIndex.setdefault(key, i)
+
+        globalCount = 0
+        for i, function in enumerate(functions):
+            jumps = script.Jumps[function.JumpIndex:function.JumpIndex + function.JumpCount]
+            compiled = FunctionCompiler(self, function, jumps).Compile()
+            compiled.Index = i
+            self.Functions[i] = compiled
+            globalCount = max(globalCount, compiled.Sizes[Global])
+        self.Globals = [0] * globalCount
+
+    def Run(self, name, *params):
+        index = self.FunctionIndex.get(name)
+        if index is None:
+            raise ScriptError(f"no function {name!r}")
+        self.Exited = False
+        try:
+            return self.Invoke(index, list(params))
+        except ScriptExit:
+            self.Exited = True
+            return None
+
+    def Invoke(self, index, params):
+        function = self.Functions[index]
+        sizes = function.Sizes
+        if len(params) < sizes[Param]:
+            params += [0] * (sizes[Param] - len(params))
+        frame = [
+            [0] * sizes[Unk],
+            [0] * sizes[Local],
+            [0] * sizes[Object],
+            params,
+            self.Globals,
+            function.Constants,
+            [None, None],
+        ]
+
+        if self.Depth >= MaxDepth:
+            raise ScriptError(f"{function.Name}: calls nested deeper than {MaxDepth}")
+        self.Depth += 1
+        code = function.Code
+        end = len(code)
+        pc = 0
+        steps = 0
+        limit = None if self.MaxSteps is None else self.MaxSteps - self.Steps
+        try:
+            if limit is None:
+                while pc < end:
+                    pc = code[pc](frame)
+                    steps += 1
+            else:
+                while pc < end:
+                    if steps >= limit:
+                        raise StepLimitError(f"{function.Name}: more than {self.MaxSteps} steps")
+                    pc = code[pc](frame)
+                    steps += 1
+        except (ScriptError, ScriptExit):
+            raise
+        except Exception as e:
+            raise ScriptError(f"{function.Name} instruction {pc}: {type(e).__name__}: {e}") from e
+        finally:
+            self.Depth -= 1
+            self.Steps += steps
+        return frame[Scratch][1]